@@ -0,0 +1,244 @@
+# ===========================================================
+# File: bench_vn30.py
+# Đo hiệu năng offline các bước tính toán của từng tab
+#
+# Ví dụ:
+#   python bench_vn30.py --quick --out bench_results.json
+#   python bench_vn30.py --tickers 18 30 300 --years 1 5 20
+#   python bench_vn30.py --quick --compare bench_results.json
+#   python bench_vn30.py --check-memory
+# ===========================================================
+
+import argparse
+import json
+import platform
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from vn30_analytics import (
+    IndicatorEngine, aligned_returns, daily_returns, efficient_frontier, estimate_moments,
+    monte_carlo_inputs, period_statistics, random_portfolios, resample_ohlcv, return_statistics,
+    rolling_matrices, screen_universe, simulate_percentiles, summary_metrics
+)
+from vn30_backtest import backtest_sma_grid, sma_grid
+from vn30_charts import (
+    downsample, montecarlo_fan_figure, point_budget, price_area_figure,
+    returns_histogram_figure
+)
+from vn30_data import (
+    PANEL_BYTES_PER_TICKER_YEAR, PriceStore, build_panel, fetch_vn30, synthetic_provider
+)
+from vn30_risk import simulate_portfolio_losses
+
+TRADING_DAYS_PER_YEAR = 252
+MAX_CORRELATION_TICKERS = 60     # (số cửa sổ × k × k) tăng theo k², bỏ qua khi quá lớn
+
+
+# ===========================================================
+# 1️⃣ Dữ liệu giả lập
+# ===========================================================
+
+def make_symbols(n_tickers):
+    return [f"S{i:03d}.VN" for i in range(n_tickers)]
+
+
+# ===========================================================
+# 2️⃣ Các bước cần đo (mỗi bước là một hàm không tham số)
+# ===========================================================
+
+def build_cases(n_tickers, years):
+    symbols = make_symbols(n_tickers)
+    n_days = years * TRADING_DAYS_PER_YEAR
+    provider = synthetic_provider(n_days=n_days, seed=1)
+    data = fetch_vn30(symbols, provider=provider).data
+    panel = build_panel(data)
+    ticker = panel.tickers[0]
+    df = panel.get(ticker)
+    selection = panel.tickers[:6]
+    budget = point_budget()
+
+    def load():
+        fetch_vn30(symbols, provider=provider)
+
+    def store_cold_and_delta():
+        with tempfile.TemporaryDirectory() as root:
+            store = PriceStore(root)
+            store.refresh(symbols, period="max", provider=provider)
+            store.refresh(symbols, period="max", provider=provider)
+
+    def panel_build():
+        build_panel(data)
+
+    def summary():
+        summary_metrics(df)
+        fig = price_area_figure(downsample(df, budget), ticker)
+        fig.to_json()
+
+    def statistics():
+        df_ret = daily_returns(df)
+        return_statistics(df_ret["Lợi_nhuận"])
+        period_statistics(resample_ohlcv(df, "M"))
+        period_statistics(resample_ohlcv(df, "Q"))
+        returns_histogram_figure(df_ret, ticker).to_json()
+
+    def screener():
+        screen_universe(panel.data)
+
+    def resample():
+        for freq in ("W", "M", "Q"):
+            resample_ohlcv(panel.data, freq)
+
+    def indicators():
+        IndicatorEngine().sync(panel)
+
+    def montecarlo():
+        last_price, daily_vol, _ = monte_carlo_inputs(df)
+        bands, _ = simulate_percentiles(last_price, daily_vol, 10_000, 60)
+        montecarlo_fan_figure(bands, ticker, 10_000).to_json()
+
+    def portfolio():
+        df_port = pd.concat([downsample(panel.get(tk), budget) for tk in selection], ignore_index=True)
+        first_close = df_port.groupby("Ticker", sort=False, observed=True)["Close"].transform("first")
+        df_port["Norm_Close"] = df_port["Close"] / first_close * 100
+        px.line(df_port, x="Date", y="Norm_Close", color="Ticker").to_json()
+
+    def optimization():
+        mu, cov = estimate_moments(panel.close, panel.tickers, None)
+        efficient_frontier(mu, cov, panel.tickers, max_weight=0.2)
+        random_portfolios(mu, cov, 20_000, max_weight=0.2)
+
+    def correlation():
+        rolling_matrices(aligned_returns(panel.close), 60)
+
+    def portfolio_var():
+        returns = aligned_returns(panel.close, selection)
+        simulate_portfolio_losses(returns, [1] * len(selection), 10, 100_000, method="bootstrap")
+
+    def backtest():
+        backtest_sma_grid(panel.close, sma_grid(range(5, 55, 5), range(20, 220, 20)))
+
+    cases = {
+        "load": load,
+        "store_cold_and_delta": store_cold_and_delta,
+        "panel_build": panel_build,
+        "summary": summary,
+        "statistics": statistics,
+        "screener": screener,
+        "resample": resample,
+        "indicators": indicators,
+        "montecarlo": montecarlo,
+        "portfolio": portfolio,
+        "optimization": optimization,
+        "portfolio_var": portfolio_var,
+        "backtest": backtest,
+    }
+    if n_tickers <= MAX_CORRELATION_TICKERS:
+        cases["correlation"] = correlation
+    return cases, len(panel.data)
+
+
+# ===========================================================
+# 3️⃣ Đo thời gian + bộ nhớ đỉnh
+# ===========================================================
+
+def measure(fn, repeat):
+    """Thời gian tốt nhất / trung vị qua `repeat` lần, rồi một lần riêng với
+    tracemalloc để lấy bộ nhớ đỉnh (không làm sai lệch số đo thời gian)."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "best_s": min(times),
+        "median_s": float(np.median(times)),
+        "peak_mb": peak / 2 ** 20,
+    }
+
+
+def run(ticker_counts, year_counts, repeat=3):
+    results = []
+    for n_tickers in ticker_counts:
+        for years in year_counts:
+            cases, n_rows = build_cases(n_tickers, years)
+            for name, fn in cases.items():
+                stats = measure(fn, repeat)
+                results.append({"case": name, "tickers": n_tickers, "years": years,
+                                "rows": n_rows, **stats})
+                print(f"{name:<22} {n_tickers:>4} mã {years:>3} năm  "
+                      f"{stats['best_s'] * 1000:>9.1f} ms  {stats['peak_mb']:>8.1f} MB")
+    return results
+
+
+def check_panel_memory(n_tickers=30, years=20):
+    """Bộ nhớ panel trên mỗi mã-năm phải nằm trong PANEL_BYTES_PER_TICKER_YEAR."""
+    provider = synthetic_provider(n_days=years * TRADING_DAYS_PER_YEAR, seed=1)
+    panel = build_panel(fetch_vn30(make_symbols(n_tickers), provider=provider).data)
+    per_ticker_year = panel.nbytes / (n_tickers * years)
+    ok = per_ticker_year <= PANEL_BYTES_PER_TICKER_YEAR
+    print(f"Bộ nhớ panel {n_tickers} mã × {years} năm: {panel.nbytes / 2 ** 20:.1f} MB "
+          f"= {per_ticker_year / 1024:.1f} KB/mã-năm (ngân sách "
+          f"{PANEL_BYTES_PER_TICKER_YEAR / 1024:.0f} KB) {'✅' if ok else '❌'}")
+    return ok, per_ticker_year
+
+
+def compare(results, baseline_path):
+    """In tỷ lệ thời gian so với một lần chạy trước (>1 là chậm hơn)."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["case"], r["tickers"], r["years"]): r for r in json.load(f)["results"]}
+    print("\nSo sánh với", baseline_path)
+    for r in results:
+        old = baseline.get((r["case"], r["tickers"], r["years"]))
+        if old:
+            ratio = r["best_s"] / old["best_s"] if old["best_s"] else float("nan")
+            flag = "  ⚠️" if ratio > 1.2 else ""
+            print(f"{r['case']:<22} {r['tickers']:>4} mã {r['years']:>3} năm  ×{ratio:.2f}{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Đo hiệu năng offline dashboard VN30")
+    parser.add_argument("--tickers", nargs="*", type=int, default=[18, 30, 300])
+    parser.add_argument("--years", nargs="*", type=int, default=[1, 5, 20])
+    parser.add_argument("--quick", action="store_true", help="Chỉ chạy 18/30 mã × 1/5 năm")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", default=None, help="File kết quả cũ để so sánh")
+    parser.add_argument("--check-memory", action="store_true",
+                        help="Chỉ kiểm tra ngân sách bộ nhớ panel (mã thoát 1 nếu vượt)")
+    args = parser.parse_args(argv)
+
+    memory_ok, per_ticker_year = check_panel_memory()
+    if args.check_memory:
+        return 0 if memory_ok else 1
+
+    tickers, years = (args.tickers, args.years) if not args.quick else ([18, 30], [1, 5])
+    results = run(tickers, years, args.repeat)
+
+    payload = {
+        "created": pd.Timestamp.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "panel_bytes_per_ticker_year": per_ticker_year,
+        "results": results,
+    }
+    if args.compare:
+        compare(results, args.compare)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    print(f"\nĐã ghi {len(results)} kết quả vào {args.out}")
+    return 0 if memory_ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
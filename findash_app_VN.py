@@ -6,44 +6,50 @@
 # ===========================================================
 
 import streamlit as st
-import yfinance as yf
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
-import numpy as np
+from datetime import datetime
+import os
+import time
+
+from vn30_data import VN30_TICKERS, BackgroundLoader, PriceStore, build_panel
+from vn30_live import LiveFeed, synthetic_quotes, yfinance_quotes
+from vn30_backtest import backtest_sma_grid, sma_grid
+from vn30_risk import simulate_portfolio_losses
+from vn30_profiling import profiled_cache, start_run
+from vn30_charts import (
+    DEFAULT_CHART_WIDTH, FigureCache, downsample, line_render_mode, montecarlo_fan_figure, point_budget,
+    loss_distribution_figure, price_area_figure, returns_box_figure, returns_histogram_figure
+)
+from vn30_analytics import (
+    RESAMPLE_FREQS, TRADING_DAYS, IndicatorEngine, IndicatorParams, aligned_returns, daily_returns,
+    efficient_frontier, estimate_moments, monte_carlo_inputs, period_statistics,
+    random_portfolios, resample_ohlcv, return_statistics, rolling_matrices, screen_universe,
+    simulate_percentiles, summary_metrics
+)
 
 # ===========================================================
 # 1️⃣ Tải dữ liệu VN30 tự động (chung cho toàn bộ ứng dụng)
 # ===========================================================
 
-@st.cache_data(ttl=3600)
+# cache_resource: mọi phiên dùng chung một luồng tải nền và một panel (không sao chép)
+@profiled_cache(st.cache_resource)
+def get_loader():
+    # Đọc bản chụp trong kho Parquet cục bộ trước, rồi tải thêm các phiên mới ở nền
+    loader = BackgroundLoader(PriceStore(), VN30_TICKERS, period="1y", ttl=3600)
+    loader.start()
+    return loader
+
+
 def load_vn30_data():
-    vn30_tickers = [
-        "FPT.VN", "HPG.VN", "MWG.VN", "VNM.VN", "VCB.VN", "SSI.VN",
-        "TCB.VN", "MBB.VN", "CTG.VN", "GAS.VN", "VHM.VN", "BVH.VN",
-        "VIC.VN", "PLX.VN", "STB.VN", "SAB.VN", "NVL.VN", "VPB.VN"
-    ]
-    data_list = []
-    for tk in vn30_tickers:
-        try:
-            df = yf.download(tk, period="1y", progress=False)
-
-# Làm phẳng cột nếu là MultiIndex
-            if isinstance(df.columns, pd.MultiIndex):
-                df.columns = df.columns.get_level_values(0)
-
-            if not df.empty:
-                df = df.reset_index()
-                df["Ticker"] = tk.replace(".VN", "")
-                data_list.append(df)
-
-        except Exception as e:
-            print(f"Lỗi tải {tk}: {e}")
-    if data_list:
-        return pd.concat(data_list)
-    else:
-        return pd.DataFrame()
+    loader = get_loader()
+    panel, failed, fresh = loader.latest()
+    if panel is None:
+        # Lượt đầu: sidebar đã hiển thị, chờ bản chụp trong kho (kho rỗng thì chờ lượt tải đầu tiên)
+        loader.wait()
+        panel, failed, fresh = loader.latest()
+    if panel is None:
+        panel = build_panel(pd.DataFrame())
+    return panel, failed, fresh
 
 # ===========================================================
 # 2️⃣ Cấu trúc giao diện sidebar
@@ -52,8 +58,21 @@ def load_vn30_data():
 st.sidebar.title("VN30 Financial Dashboard")
 st.sidebar.write("Ứng dụng phân tích dữ liệu tài chính nhóm VN30")
 
-st.sidebar.info("🔄 Đang tải dữ liệu VN30 ...")
-data = load_vn30_data()
+# Chẩn đoán hiệu năng: bật bằng ô chọn cuối sidebar hoặc biến môi trường VN30_PROFILE=1
+profiler = start_run(
+    enabled=st.session_state.get("diagnostics", False) or os.environ.get("VN30_PROFILE") == "1"
+)
+
+status = st.sidebar.empty()
+status.info("🔄 Đang tải dữ liệu VN30 ...")
+with profiler.phase("load_vn30_data"):
+    panel, failed_tickers, is_fresh = load_vn30_data()
+data = panel.data
+
+if failed_tickers:
+    st.sidebar.warning(
+        "⚠️ Không tải được: " + ", ".join(f"{e.ticker} ({e.error})" for e in failed_tickers)
+    )
 
 # ===============================
 # ✅ Kiểm tra dữ liệu VN30 đã tải
@@ -62,11 +81,27 @@ if data.empty:
     st.error("❌ Không tải được dữ liệu. Kiểm tra kết nối mạng hoặc mã cổ phiếu.")
     st.stop()
 else:
-    num_tickers = data["Ticker"].nunique()
+    num_tickers = len(panel.tickers)
     num_rows = len(data)
-    st.sidebar.success(f"✅ Tải thành công {num_tickers} mã cổ phiếu ({num_rows:,} dòng dữ liệu).")
+    status.success(f"✅ Tải thành công {num_tickers} mã cổ phiếu ({num_rows:,} dòng dữ liệu).")
+
+if not is_fresh and not get_loader().is_loading:
+    status.warning(f"🗂️ Đang hiển thị bản lưu cục bộ ({num_rows:,} dòng); cập nhật thất bại, sẽ thử lại sau.")
+elif not is_fresh:
+    status.info(f"🗂️ Đang hiển thị bản lưu cục bộ ({num_rows:,} dòng), đang cập nhật dữ liệu mới ...")
 
-tickers = sorted(data["Ticker"].unique())
+    # Kiểm tra định kỳ; khi lượt tải kết thúc (xong hoặc lỗi) thì chạy lại toàn
+    # trang. Lượt lỗi được thử lại ở nền sau `retry_after` giây.
+    @st.fragment(run_every=2)
+    def wait_for_fresh_data():
+        loader = get_loader()
+        if loader.is_fresh or not loader.is_loading:
+            st.rerun()
+
+    with st.sidebar:
+        wait_for_fresh_data()
+
+tickers = panel.tickers
 ticker = st.sidebar.selectbox("Chọn mã cổ phiếu", tickers)
 
 # ===========================================================
@@ -75,9 +110,55 @@ ticker = st.sidebar.selectbox("Chọn mã cổ phiếu", tickers)
 
 tab = st.sidebar.radio(
     "Chọn phần hiển thị:",
-    ["Summary", "Chart", "Statistics", "Monte Carlo Simulation", "Portfolio Trend"]
+    [
+        "Summary", "Chart", "Statistics", "Monte Carlo Simulation",
+        "Portfolio Trend", "Portfolio Optimization", "Correlation", "Live", "Backtest"
+    ]
 )
 
+# Ngân sách điểm mỗi đường theo bề rộng biểu đồ (giảm mẫu LTTB khi dữ liệu dài)
+with st.sidebar.expander("⚙️ Hiển thị biểu đồ"):
+    chart_width = st.slider("Bề rộng biểu đồ (px)", 600, 2400, DEFAULT_CHART_WIDTH, step=200)
+budget = point_budget(chart_width)
+
+
+def plotly_chart(fig, **kwargs):
+    # Ghi kích thước biểu đồ (khi bật chẩn đoán) rồi hiển thị như st.plotly_chart
+    profiler.record_figure(fig.layout.title.text or "figure", fig)
+    st.plotly_chart(fig, **kwargs)
+
+
+@profiled_cache(st.cache_resource)
+def get_figure_cache():
+    # Một cache biểu đồ cho mọi phiên, giới hạn theo dung lượng (VN30_FIGURE_CACHE_MB)
+    return FigureCache(max_bytes=int(os.environ.get("VN30_FIGURE_CACHE_MB", "64")) * 2 ** 20)
+
+
+def cached_chart(key, build, **kwargs):
+    # Khóa đầy đủ: (tab, phiên bản dữ liệu, ngân sách điểm) + (mã/danh mục, tham số)
+    t0 = time.perf_counter()
+    fig, hit = get_figure_cache().get_or_build((tab, panel.version, budget) + tuple(key), build)
+    profiler.record_cache(f"figure:{key[0]}", hit=hit, wall_s=time.perf_counter() - t0)
+    plotly_chart(fig, **kwargs)
+
+
+@profiled_cache(st.cache_data(max_entries=256))
+def downsampled_prices(_panel, version, ticker, budget):
+    # Khóa cache: (phiên bản dữ liệu, mã, ngân sách điểm)
+    return downsample(_panel.get(ticker), budget)
+
+
+@profiled_cache(st.cache_data(max_entries=256))
+def downsampled_indicators(_engine, version, ticker, budget):
+    return downsample(_engine.get(ticker), budget, y="_close")
+
+
+@profiled_cache(st.cache_resource(max_entries=8))
+def resampled_bars(_panel, version, freq):
+    # Nến tuần/tháng/quý của mọi mã trong một lượt, tách sẵn theo mã (dùng chung, chỉ đọc)
+    bars = resample_ohlcv(_panel.data, freq)
+    return {tk: df.reset_index(drop=True) for tk, df in bars.groupby("Ticker", sort=False, observed=True)}
+
 # ===========================================================
 # 4️⃣ TAB 1 - SUMMARY (Nguyễn Thị Hồng Thắm)
 # ===========================================================
@@ -96,8 +177,8 @@ def tab_summary():
     
 
     # --- 1️⃣ Lọc dữ liệu theo mã được chọn ---
-    df_ticker = data[data["Ticker"] == ticker].copy()
-    df_ticker = df_ticker.sort_values("Date")
+    df_ticker = panel.get(ticker)                                  # đã sắp xếp theo Date
+    profiler.set_rows(len(df_ticker))
 
     if df_ticker.empty:
         st.warning("⚠️ Không có dữ liệu cho mã cổ phiếu này.")
@@ -114,17 +195,14 @@ def tab_summary():
     )
 
     # --- 2️⃣ Tính toán các chỉ số tổng quan ---
-    df_ticker["Return"] = df_ticker["Close"].pct_change()
-    latest_close = df_ticker["Close"].iloc[-1]                     # Giá đóng cửa gần nhất
-    mean_30d = df_ticker["Close"].tail(30).mean()                  # Trung bình 30 ngày gần nhất
-    std_return = df_ticker["Return"].std()                         # Độ lệch chuẩn lợi nhuận
+    metrics = summary_metrics(df_ticker)                           # giá mới nhất, TB 30 ngày, σ lợi nhuận
 
     # --- 3️⃣ Hiển thị các chỉ tiêu cơ bản ---
     st.subheader("📈 Các chỉ tiêu cơ bản")
     col1, col2, col3 = st.columns(3)
-    col1.metric("💰 Giá đóng cửa mới nhất", f"{latest_close:,.2f} VND")
-    col2.metric("📆 Trung bình 30 ngày gần nhất", f"{mean_30d:,.2f} VND")
-    col3.metric("📉 Độ lệch chuẩn lợi nhuận (σ)", f"{std_return:.2%}")
+    col1.metric("💰 Giá đóng cửa mới nhất", f"{metrics['latest_close']:,.2f} VND")
+    col2.metric("📆 Trung bình 30 ngày gần nhất", f"{metrics['mean_30d']:,.2f} VND")
+    col3.metric("📉 Độ lệch chuẩn lợi nhuận (σ)", f"{metrics['std_return']:.2%}")
 
     st.markdown("""
     <div style="text-align: justify;">
@@ -139,46 +217,10 @@ def tab_summary():
 
     # --- 4️⃣ Biểu đồ giá cổ phiếu ---
     st.subheader(f"📊 Diễn biến giá cổ phiếu {ticker} trong 1 năm gần đây")
+    df_plot = downsampled_prices(panel, panel.version, ticker, budget)
 
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=df_ticker["Date"],
-        y=df_ticker["Close"],
-        mode="lines",
-        name="Giá đóng cửa",
-        line=dict(color="#0077b6", width=2),
-        fill="tozeroy",
-        fillcolor="rgba(0, 119, 182, 0.25)"
-    ))
-
-    # Bộ chọn thời gian
-    fig.update_xaxes(
-        rangeselector=dict(
-            buttons=list([
-                dict(count=1, label="1M", step="month", stepmode="backward"),
-                dict(count=3, label="3M", step="month", stepmode="backward"),
-                dict(count=6, label="6M", step="month", stepmode="backward"),
-                dict(count=1, label="1Y", step="year", stepmode="backward"),
-                dict(step="all", label="MAX")
-            ])
-        ),
-        rangeslider=dict(visible=False),
-        type="date"
-    )
-
-    # Tùy chỉnh giao diện
-    fig.update_layout(
-        title=f"Biểu đồ biến động giá cổ phiếu {ticker}",
-        xaxis_title="Thời gian",
-        yaxis_title="Giá đóng cửa (VND)",
-        template="plotly_white",
-        hovermode="x unified",
-        plot_bgcolor="rgba(0,0,0,0)",
-        paper_bgcolor="rgba(0,0,0,0)",
-        margin=dict(l=20, r=20, t=60, b=30)
-    )
-
-    st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": True})
+    cached_chart(("price", ticker), lambda: price_area_figure(df_plot, ticker),
+                 use_container_width=True, config={"displayModeBar": True})
 
     # --- 5️⃣ Bảng dữ liệu 100 ngày gần nhất ---
     st.subheader("📋 Bảng dữ liệu 100 ngày gần nhất")
@@ -203,26 +245,135 @@ def tab_summary():
 # 5️⃣ TAB 2 - CHART (Phan Văn Thảo)
 # ===========================================================
 
+@profiled_cache(st.cache_resource)
+def get_indicator_engine(params=IndicatorParams()):
+    # Một engine dùng chung cho mọi phiên; tự cập nhật khi panel đổi phiên bản
+    return IndicatorEngine(params)
+
+
 def tab_chart():
-    st.title("📈 Phân tích biểu đồ giá và chỉ báo kỹ thuật")
-    df_ticker = data[data["Ticker"] == ticker]
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
 
-    # Tính SMA (đường trung bình động)
-    df_ticker["SMA_20"] = df_ticker["Close"].rolling(window=20).mean()
-    df_ticker["SMA_50"] = df_ticker["Close"].rolling(window=50).mean()
+    st.title("📈 Phân tích biểu đồ giá và chỉ báo kỹ thuật")
+    params = IndicatorParams()
+    engine = get_indicator_engine(params).sync(panel)
+    if engine.get(ticker) is None:
+        st.warning("⚠️ Không có dữ liệu cho mã cổ phiếu này.")
+        return
+    profiler.set_rows(len(engine.get(ticker)))
+    df_ind = downsampled_indicators(engine, engine.version, ticker, budget)
 
-    # Biểu đồ giá + SMA
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=df_ticker["Date"], y=df_ticker["Close"], mode="lines", name="Close"))
-    fig.add_trace(go.Scatter(x=df_ticker["Date"], y=df_ticker["SMA_20"], mode="lines", name="SMA 20"))
-    fig.add_trace(go.Scatter(x=df_ticker["Date"], y=df_ticker["SMA_50"], mode="lines", name="SMA 50"))
-    fig.update_layout(title=f"Đường giá và trung bình động của {ticker}")
-    st.plotly_chart(fig, use_container_width=True)
+    sma_names = [f"SMA {w}" for w in params.sma]
+    ema_names = [f"EMA {s}" for s in params.ema]
+    selected = st.multiselect(
+        "Chọn chỉ báo kỹ thuật",
+        sma_names + ema_names + ["Bollinger Bands", "RSI", "MACD"],
+        default=sma_names
+    )
+    col1, col2, col3 = st.columns([2, 1, 1])
+    timeframe = col1.radio("Khung thời gian", ["Ngày"] + list(RESAMPLE_FREQS.values()), horizontal=True)
+    style = col2.radio("Kiểu giá", ["Đường", "Nến"], horizontal=True)
+    show_volume = col3.checkbox("Khối lượng", value=True)
+
+    def indicator_figure():
+        # Nến của khung đã chọn: ngày lấy từ panel đã giảm mẫu (cùng ngân sách điểm
+        # và cùng các phiên LTTB chọn cho chỉ báo), tuần/tháng/quý từ lớp gộp nến
+        if timeframe == "Ngày":
+            bars = downsampled_prices(panel, panel.version, ticker, budget) if style == "Nến" or show_volume else None
+        else:
+            freq = next(f for f, name in RESAMPLE_FREQS.items() if name == timeframe)
+            bars = resampled_bars(panel, panel.version, freq)[ticker]
+
+        # Biểu đồ giá + đường trung bình; khối lượng, RSI/MACD vẽ ở các hàng phụ bên dưới
+        sub_rows = (["Volume"] if show_volume else []) + [name for name in ["RSI", "MACD"] if name in selected]
+        fig = make_subplots(
+            rows=1 + len(sub_rows), cols=1, shared_xaxes=True, vertical_spacing=0.05,
+            row_heights=[0.6] + [0.4 / len(sub_rows)] * len(sub_rows) if sub_rows else [1.0]
+        )
+        x = df_ind["Date"]
+        if style == "Nến":
+            fig.add_trace(go.Candlestick(
+                x=bars["Date"], open=bars["Open"], high=bars["High"], low=bars["Low"], close=bars["Close"],
+                name=f"Nến {timeframe.lower()}"
+            ), row=1, col=1)
+            fig.update_xaxes(rangeslider_visible=False)
+        elif timeframe == "Ngày":
+            fig.add_trace(go.Scatter(x=x, y=df_ind["_close"], mode="lines", name="Close"), row=1, col=1)
+        else:
+            fig.add_trace(go.Scatter(x=bars["Date"], y=bars["Close"], mode="lines+markers",
+                                     name=f"Close ({timeframe.lower()})"), row=1, col=1)
+        for name in selected:
+            if name.startswith(("SMA", "EMA")):
+                col = name.replace(" ", "_")
+                fig.add_trace(go.Scatter(x=x, y=df_ind[col], mode="lines", name=name), row=1, col=1)
+        if "Bollinger Bands" in selected:
+            fig.add_trace(go.Scatter(
+                x=x, y=df_ind["BB_upper"], mode="lines", name="Bollinger trên",
+                line=dict(width=1, dash="dot", color="gray")
+            ), row=1, col=1)
+            fig.add_trace(go.Scatter(
+                x=x, y=df_ind["BB_lower"], mode="lines", name="Bollinger dưới",
+                line=dict(width=1, dash="dot", color="gray"),
+                fill="tonexty", fillcolor="rgba(128, 128, 128, 0.1)"
+            ), row=1, col=1)
+
+        for i, name in enumerate(sub_rows, start=2):
+            if name == "Volume":
+                fig.add_trace(go.Bar(x=bars["Date"], y=bars["Volume"], name="Khối lượng",
+                                     marker_color="#90a4ae"), row=i, col=1)
+            elif name == "RSI":
+                fig.add_trace(go.Scatter(x=x, y=df_ind[f"RSI_{params.rsi}"], mode="lines", name=f"RSI {params.rsi}"), row=i, col=1)
+                fig.add_hline(y=70, line_dash="dash", line_color="red", row=i, col=1)
+                fig.add_hline(y=30, line_dash="dash", line_color="green", row=i, col=1)
+            else:
+                fig.add_trace(go.Bar(x=x, y=df_ind["MACD_hist"], name="MACD histogram", marker_color="#adb5bd"), row=i, col=1)
+                fig.add_trace(go.Scatter(x=x, y=df_ind["MACD"], mode="lines", name="MACD"), row=i, col=1)
+                fig.add_trace(go.Scatter(x=x, y=df_ind["MACD_signal"], mode="lines", name="Signal"), row=i, col=1)
+
+        fig.update_layout(title=f"Đường giá và chỉ báo kỹ thuật của {ticker}", height=450 + 200 * len(sub_rows))
+        return fig
+
+    cached_chart(("indicators", ticker, tuple(selected), timeframe, style, show_volume),
+                 indicator_figure, use_container_width=True)
 
 # ===========================================================
 # 6️⃣ TAB 3 - STATISTICS (Nguyễn Hoàng Thiên Bảo)
 # ===========================================================
+@profiled_cache(st.cache_data)
+def cached_screener(_panel, version):
+    # Khóa cache: phiên bản dữ liệu (một lần groupby cho toàn bộ VN30)
+    return screen_universe(_panel.data)
+
+
+def tab_screener():
+    st.subheader("🏆 Bảng xếp hạng toàn bộ VN30")
+    table = cached_screener(panel, panel.version)
+    st.dataframe(
+        table.style.format({
+            "count": "{:.0f}",
+            "Vol_năm": "{:.2%}",
+            "Sụt_giảm_tối_đa": "{:.2%}",
+            "Lợi_nhuận_kỳ": "{:.2%}",
+        }, precision=4),
+        use_container_width=True,
+        height=min(40 + 35 * len(table), 800)
+    )
+    st.markdown("""
+    <div style="text-align: justify;">
+    <b>💡 Cách dùng:</b> bấm vào tiêu đề cột để sắp xếp.
+    <ul>
+        <li><b>Vol_năm</b>: độ lệch chuẩn lợi nhuận ngày × √252.</li>
+        <li><b>Sụt_giảm_tối_đa</b>: mức giảm lớn nhất từ đỉnh gần nhất trước đó.</li>
+        <li><b>Lợi_nhuận_kỳ</b>: tăng/giảm giá từ phiên đầu đến phiên cuối của dữ liệu.</li>
+    </ul>
+    </div>
+    """, unsafe_allow_html=True)
+
+
 def tab_statistics():
+    import plotly.express as px
+
     # --- Tiêu đề tab ---
     st.markdown("""
         <h1 style='text-align: center; color: #1a73e8;'>
@@ -230,27 +381,28 @@ def tab_statistics():
         </h1>
     """, unsafe_allow_html=True)
 
+    view = st.radio("Chế độ xem", [f"Mã {ticker}", "Toàn bộ VN30"], horizontal=True)
+    if view == "Toàn bộ VN30":
+        tab_screener()
+        return
+
     # --- Lọc dữ liệu theo mã cổ phiếu được chọn ---
-    df_ticker = data[data["Ticker"] == ticker].copy()
+    df_ticker = panel.get(ticker)
+    profiler.set_rows(len(df_ticker))
     if df_ticker.empty:
         st.warning("⚠️ Không có dữ liệu cho mã cổ phiếu này.")
         return
 
     # --- Tính tỷ suất lợi nhuận hàng ngày ---
-    df_ticker["Lợi_nhuận"] = df_ticker["Close"].pct_change()
-    df_ticker.dropna(inplace=True)
+    df_ret = daily_returns(df_ticker)
 
-    # --- Thêm cột Tháng & Quý (1 lần duy nhất) ---
-    df_ticker["Tháng"] = df_ticker["Date"].dt.to_period("M")
-    df_ticker["Quý"] = df_ticker["Date"].dt.to_period("Q")
+    # --- Thống kê theo Tháng & Quý (lấy từ nến tháng/quý đã gộp sẵn cho mọi mã) ---
+    monthly_stats = period_statistics(resampled_bars(panel, panel.version, "M")[ticker]).rename(columns={"Kỳ": "Tháng"})
+    quarterly_stats = period_statistics(resampled_bars(panel, panel.version, "Q")[ticker]).rename(columns={"Kỳ": "Quý"})
 
     # --- Bảng mô tả thống kê cơ bản ---
     st.subheader("📋 Bảng mô tả thống kê cơ bản")
-    stats_df = df_ticker["Lợi_nhuận"].describe().to_frame()
-    stats_df.loc["Độ lệch (Skew)"] = df_ticker["Lợi_nhuận"].skew()
-    stats_df.loc["Độ nhọn (Kurtosis)"] = df_ticker["Lợi_nhuận"].kurt()
-    sharpe_ratio = df_ticker["Lợi_nhuận"].mean() / df_ticker["Lợi_nhuận"].std()
-    stats_df.loc["Chỉ số Sharpe (Lợi nhuận theo rủi ro)"] = sharpe_ratio
+    stats_df = return_statistics(df_ret["Lợi_nhuận"])
 
     # Hiển thị bảng
     st.dataframe(
@@ -262,14 +414,7 @@ def tab_statistics():
     )
 
     # --- Boxplot lợi nhuận ---
-    fig_box = px.box(
-        df_ticker, y="Lợi_nhuận",
-        color_discrete_sequence=["#ff6361"],
-        title=f"Boxplot lợi nhuận cổ phiếu {ticker}",
-        labels={"Lợi_nhuận": "Tỷ suất lợi nhuận hàng ngày"}
-    )
-    fig_box.update_layout(template="plotly_white")
-    st.plotly_chart(fig_box, use_container_width=True)
+    cached_chart(("box", ticker), lambda: returns_box_figure(df_ret, ticker), use_container_width=True)
 
     # --- Giải thích ý nghĩa ---
     st.markdown("""
@@ -288,14 +433,7 @@ def tab_statistics():
 
     # --- Histogram lợi nhuận ---
     st.subheader("📊 Phân phối tỷ suất lợi nhuận (Rủi ro biến động)")
-    fig_hist = px.histogram(
-        df_ticker, x="Lợi_nhuận", nbins=40,
-        color_discrete_sequence=["#1a73e8"],
-        title=f"Phân phối lợi nhuận cổ phiếu {ticker}",
-        labels={"Lợi_nhuận": "Tỷ suất lợi nhuận hàng ngày", "count": "Số ngày"}
-    )
-    fig_hist.update_layout(template="plotly_white")
-    st.plotly_chart(fig_hist, use_container_width=True)
+    cached_chart(("histogram", ticker), lambda: returns_histogram_figure(df_ret, ticker), use_container_width=True)
 
     st.markdown("""
     <div style="text-align: justify;">
@@ -312,29 +450,31 @@ def tab_statistics():
     st.subheader("📅 Lợi nhuận trung bình theo Tháng và Quý")
 
     # Theo Tháng
-    monthly_ret = df_ticker.groupby("Tháng")["Lợi_nhuận"].mean().reset_index()
-    monthly_ret["Tháng"] = monthly_ret["Tháng"].astype(str)
-    fig_month = px.bar(
-        monthly_ret, x="Tháng", y="Lợi_nhuận",
-        title="Lợi nhuận trung bình theo Tháng",
-        text_auto=".2%", color_discrete_sequence=["#003f5c"],
-        labels={"Tháng": "Tháng (YYYY-MM)", "Lợi_nhuận": "Tỷ suất lợi nhuận trung bình"}
-    )
-    fig_month.update_layout(xaxis=dict(tickangle=-45, automargin=True), yaxis=dict(automargin=True), template="plotly_white")
-    fig_month.update_traces(textposition='outside', cliponaxis=False)
-    st.plotly_chart(fig_month, use_container_width=True)
+    def monthly_mean_figure():
+        fig = px.bar(
+            monthly_stats, x="Tháng", y="mean",
+            title="Lợi nhuận trung bình theo Tháng",
+            text_auto=".2%", color_discrete_sequence=["#003f5c"],
+            labels={"Tháng": "Tháng (YYYY-MM)", "mean": "Tỷ suất lợi nhuận trung bình"}
+        )
+        fig.update_layout(xaxis=dict(tickangle=-45, automargin=True), yaxis=dict(automargin=True), template="plotly_white")
+        fig.update_traces(textposition='outside', cliponaxis=False)
+        return fig
+
+    cached_chart(("monthly_mean", ticker), monthly_mean_figure, use_container_width=True)
 
     # Theo Quý
-    quarterly_ret = df_ticker.groupby("Quý")["Lợi_nhuận"].mean().reset_index()
-    quarterly_ret["Quý"] = quarterly_ret["Quý"].astype(str)
-    fig_quarter = px.bar(
-        quarterly_ret, x="Quý", y="Lợi_nhuận",
-        title="Lợi nhuận trung bình theo Quý",
-        text_auto=".2%", color_discrete_sequence=["#58508d"],
-        labels={"Quý": "Quý (YYYYQ)", "Lợi_nhuận": "Tỷ suất lợi nhuận trung bình"}
-    )
-    fig_quarter.update_layout(xaxis_tickangle=0, template="plotly_white")
-    st.plotly_chart(fig_quarter, use_container_width=True)
+    def quarterly_mean_figure():
+        fig = px.bar(
+            quarterly_stats, x="Quý", y="mean",
+            title="Lợi nhuận trung bình theo Quý",
+            text_auto=".2%", color_discrete_sequence=["#58508d"],
+            labels={"Quý": "Quý (YYYYQ)", "mean": "Tỷ suất lợi nhuận trung bình"}
+        )
+        fig.update_layout(xaxis_tickangle=0, template="plotly_white")
+        return fig
+
+    cached_chart(("quarterly_mean", ticker), quarterly_mean_figure, use_container_width=True)
 
     st.markdown("""
     <div style="text-align: justify;">
@@ -351,38 +491,38 @@ def tab_statistics():
     st.subheader("📈 Sharpe Ratio theo Tháng và Quý")
 
     # Theo Tháng
-    monthly_stats = df_ticker.groupby("Tháng")["Lợi_nhuận"].agg(['mean', 'std']).reset_index()
-    monthly_stats["Sharpe"] = (monthly_stats["mean"] / monthly_stats["std"]) * 100
-    monthly_stats["Tháng"] = monthly_stats["Tháng"].astype(str)
-    fig_sharpe_month = px.bar(
-        monthly_stats,
-        x="Tháng",
-        y="Sharpe",
-        text=monthly_stats["Sharpe"].map("{:.2f}%".format),
-        color_discrete_sequence=["#ff7f0e"],
-        title=f"Sharpe Ratio theo Tháng của {ticker}",
-        labels={"Sharpe": "Sharpe Ratio (%)", "Tháng": "Tháng (YYYY-MM)"}
-    )
-    fig_sharpe_month.update_layout(xaxis=dict(tickangle=-45, automargin=True), yaxis=dict(automargin=True), template="plotly_white")
-    fig_sharpe_month.update_traces(textposition='outside', cliponaxis=False)
-    st.plotly_chart(fig_sharpe_month, use_container_width=True)
+    def monthly_sharpe_figure():
+        fig = px.bar(
+            monthly_stats,
+            x="Tháng",
+            y="Sharpe",
+            text=monthly_stats["Sharpe"].map("{:.2f}%".format),
+            color_discrete_sequence=["#ff7f0e"],
+            title=f"Sharpe Ratio theo Tháng của {ticker}",
+            labels={"Sharpe": "Sharpe Ratio (%)", "Tháng": "Tháng (YYYY-MM)"}
+        )
+        fig.update_layout(xaxis=dict(tickangle=-45, automargin=True), yaxis=dict(automargin=True), template="plotly_white")
+        fig.update_traces(textposition='outside', cliponaxis=False)
+        return fig
+
+    cached_chart(("monthly_sharpe", ticker), monthly_sharpe_figure, use_container_width=True)
 
     # Theo Quý
-    quarterly_stats = df_ticker.groupby("Quý")["Lợi_nhuận"].agg(['mean', 'std']).reset_index()
-    quarterly_stats["Sharpe"] = (quarterly_stats["mean"] / quarterly_stats["std"]) * 100
-    quarterly_stats["Quý"] = quarterly_stats["Quý"].astype(str)
-    fig_sharpe_quarter = px.bar(
-        quarterly_stats,
-        x="Quý",
-        y="Sharpe",
-        text=quarterly_stats["Sharpe"].map("{:.2f}%".format),
-        color_discrete_sequence=["#ffa600"],
-        title=f"Sharpe Ratio theo Quý của {ticker}",
-        labels={"Sharpe": "Sharpe Ratio (%)", "Quý": "Quý (YYYYQ)"}
-    )
-    fig_sharpe_quarter.update_layout(xaxis=dict(tickangle=0, automargin=True), yaxis=dict(automargin=True), template="plotly_white")
-    fig_sharpe_quarter.update_traces(textposition='outside', cliponaxis=False)
-    st.plotly_chart(fig_sharpe_quarter, use_container_width=True)
+    def quarterly_sharpe_figure():
+        fig = px.bar(
+            quarterly_stats,
+            x="Quý",
+            y="Sharpe",
+            text=quarterly_stats["Sharpe"].map("{:.2f}%".format),
+            color_discrete_sequence=["#ffa600"],
+            title=f"Sharpe Ratio theo Quý của {ticker}",
+            labels={"Sharpe": "Sharpe Ratio (%)", "Quý": "Quý (YYYYQ)"}
+        )
+        fig.update_layout(xaxis=dict(tickangle=0, automargin=True), yaxis=dict(automargin=True), template="plotly_white")
+        fig.update_traces(textposition='outside', cliponaxis=False)
+        return fig
+
+    cached_chart(("quarterly_sharpe", ticker), quarterly_sharpe_figure, use_container_width=True)
 
     # Giải thích Sharpe Ratio
     st.markdown("""
@@ -401,31 +541,104 @@ def tab_statistics():
 # 7️⃣ TAB 4 - MONTE CARLO SIMULATION (Phan Văn Thảo)
 # ===========================================================
 
+PORTFOLIO_DEFAULT = ["FPT", "VNM", "VCB", "HPG", "SSI", "MWG"]
+RISK_METHODS = {"Cholesky (phân phối chuẩn có tương quan)": "cholesky",
+                "Bootstrap khối (lợi nhuận lịch sử)": "bootstrap"}
+
+
+@profiled_cache(st.cache_data(max_entries=16))
+def cached_portfolio_risk(_panel, version, selection, weights, horizon, n_paths, method, block):
+    # Khóa cache: (phiên bản dữ liệu, danh mục, tỷ trọng, tham số mô phỏng)
+    returns = aligned_returns(_panel.close, list(selection))
+    return simulate_portfolio_losses(returns, weights, horizon=horizon, n_paths=n_paths,
+                                     method=method, block=block, seed=42)
+
+
+def tab_portfolio_risk():
+    # Danh mục mặc định = các mã đang chọn ở tab Portfolio Trend
+    default = [tk for tk in st.session_state.get("portfolio_selection", PORTFOLIO_DEFAULT) if tk in tickers]
+    selected = st.multiselect("📌 Danh mục", tickers, default=default)
+    if len(selected) < 2:
+        st.warning("⚠️ Vui lòng chọn ít nhất hai mã cổ phiếu.")
+        return
+    selected = sorted(selected)
+
+    col1, col2 = st.columns([1, 2])
+    weights_df = col1.data_editor(
+        pd.DataFrame({"Mã": selected, "Tỷ trọng (%)": [round(100 / len(selected), 2)] * len(selected)}),
+        hide_index=True, disabled=["Mã"], key=f"risk_weights_{'_'.join(selected)}"
+    )
+    weights = weights_df["Tỷ trọng (%)"].fillna(0).clip(lower=0).to_numpy()
+    if weights.sum() <= 0:
+        st.warning("⚠️ Tổng tỷ trọng phải lớn hơn 0.")
+        return
+
+    method = RISK_METHODS[col2.radio("Phương pháp", list(RISK_METHODS))]
+    block = col2.slider("Độ dài khối bootstrap (phiên)", 1, 20, 5) if method == "bootstrap" else 1
+    horizon = col2.slider("Số phiên nắm giữ", 1, 60, 10)
+    n_paths = col2.select_slider("Số đường mô phỏng", [10_000, 100_000, 1_000_000], value=100_000)
+    notional = col2.number_input("Giá trị danh mục (triệu VND)", 1.0, 1e6, 1000.0, step=100.0)
+
+    profiler.set_rows(sum(len(panel.get(tk)) for tk in selected))
+    result = cached_portfolio_risk(
+        panel, panel.version, tuple(selected), tuple(weights / weights.sum()),
+        horizon, n_paths, method, block
+    )
+    risk = result.summary()
+    cols = st.columns(len(risk))
+    for col, (label, value) in zip(cols, risk.items()):
+        col.metric(label.replace("_", " "), f"{value:.2%}", f"{value * notional:,.1f} triệu VND",
+                   delta_color="off")
+    cached_chart(("losses", tuple(selected), tuple(weights), horizon, n_paths, method, block),
+                 lambda: loss_distribution_figure(result.losses, risk, horizon), use_container_width=True)
+    st.caption(
+        "VaR: mức lỗ không bị vượt với xác suất tương ứng; CVaR: lỗ trung bình khi vượt VaR. "
+        "Danh mục mua & giữ theo tỷ trọng ban đầu."
+    )
+
+
+@profiled_cache(st.cache_data(max_entries=32))
+def cached_montecarlo(_panel, version, ticker, n_sim, horizon, gbm):
+    # Khóa cache: (phiên bản dữ liệu, mã, tham số mô phỏng); chỉ giữ dải phân
+    # vị và xác suất tăng giá, không giữ mảng giá cuối kỳ của mọi đường
+    last_price, daily_vol, mean_return = monte_carlo_inputs(_panel.get(ticker))
+    bands, final_prices = simulate_percentiles(
+        last_price, daily_vol, n_sim, horizon, drift=mean_return if gbm else 0.0, gbm=gbm, seed=42
+    )
+    return bands, float((final_prices > last_price).mean())
+
+
 def tab_montecarlo():
     st.title("🎲 Mô phỏng Monte Carlo")
-    df_ticker = data[data["Ticker"] == ticker]
-    df_ticker["Return"] = df_ticker["Close"].pct_change().dropna()
-    daily_vol = df_ticker["Return"].std()
-    last_price = df_ticker["Close"].iloc[-1]
+    view = st.radio("Đối tượng mô phỏng", [f"Mã {ticker}", "Danh mục (VaR / CVaR)"], horizontal=True)
+    if view != f"Mã {ticker}":
+        tab_portfolio_risk()
+        return
 
-    n_sim = st.slider("Số lần mô phỏng", 200, 1000, 500)
+    n_sim = st.slider("Số lần mô phỏng", 1000, 200000, 10000, step=1000)
     t_horizon = st.slider("Số ngày dự báo", 30, 180, 60)
+    use_gbm = st.checkbox("Dùng mô hình GBM có xu hướng (drift) theo lợi nhuận lịch sử", value=False)
+
+    profiler.set_rows(len(panel.get(ticker)))
+    # Sinh ma trận mô phỏng theo khối bằng NumPy, chỉ giữ các dải phân vị
+    bands, prob_up = cached_montecarlo(panel, panel.version, ticker, n_sim, t_horizon, use_gbm)
 
-    np.random.seed(42)
-    simulation_df = pd.DataFrame()
+    # Biểu đồ quạt: dải 5–95% và 25–75% quanh đường trung vị
+    cached_chart(("fan", ticker, n_sim, t_horizon, use_gbm),
+                 lambda: montecarlo_fan_figure(bands, ticker, n_sim), use_container_width=True)
 
-    for i in range(n_sim):
-        price_series = [last_price]
-        for j in range(t_horizon):
-            price_series.append(price_series[-1] * (1 + np.random.normal(0, daily_vol)))
-        simulation_df[i] = price_series
+    col1, col2, col3 = st.columns(3)
+    col1.metric("📉 Giá cuối kỳ (P5)", f"{bands['P5'].iloc[-1]:,.2f} VND")
+    col2.metric("📊 Giá cuối kỳ (trung vị)", f"{bands['P50'].iloc[-1]:,.2f} VND")
+    col3.metric("📈 Xác suất tăng giá", f"{prob_up:.2%}")
 
-    st.line_chart(simulation_df)
 # ===========================================================
 # 8️⃣ TAB 5 - PORTFOLIO TREND (Nguyễn Hoàng Thiên Bảo)
 # ===========================================================
 
 def tab_portfolio():
+    import plotly.express as px
+
     st.markdown("""
         <h1 style='text-align: center; color: #1a73e8;'>
             📊 So sánh xu hướng
@@ -436,38 +649,46 @@ def tab_portfolio():
     selected = st.multiselect(
         "📌 Chọn cổ phiếu để so sánh xu hướng", 
         tickers, 
-        default=["FPT", "VNM", "VCB", "HPG", "SSI", "MWG"]
+        default=PORTFOLIO_DEFAULT
     )
+    st.session_state["portfolio_selection"] = selected          # dùng lại ở tab Monte Carlo (VaR)
 
     if not selected:
         st.warning("⚠️ Vui lòng chọn ít nhất một mã cổ phiếu.")
         return
 
-    df_port = data[data["Ticker"].isin(selected)].copy()
-    df_port = df_port.sort_values(["Ticker", "Date"])
+    # Bảng mới, đã sắp xếp theo (Ticker, Date), mỗi mã đã giảm mẫu theo ngân sách điểm
+    df_port = pd.concat(
+        [downsampled_prices(panel, panel.version, tk, budget) for tk in sorted(selected)],
+        ignore_index=True
+    )
+    profiler.set_rows(len(df_port))
 
     # --- Biểu đồ 1: Biến động giá chuẩn hóa (%) ---
-    df_port["Norm_Close"] = df_port.groupby("Ticker")["Close"].transform(lambda x: x / x.iloc[0] * 100)
-    df_port["Tooltip_Norm"] = df_port.apply(
-        lambda row: f"{row['Ticker']}<br>Ngày: {row['Date'].strftime('%Y-%m-%d')}<br>Giá: {row['Close']:,.0f} VND<br>Tỷ lệ: {row['Norm_Close']:.2f}%", axis=1
-    )
+    first_close = df_port.groupby("Ticker", sort=False, observed=True)["Close"].transform("first")
+    df_port["Norm_Close"] = df_port["Close"] / first_close * 100
+    render_mode = line_render_mode(len(df_port))      # WebGL khi nhiều điểm
 
     st.subheader("📈 Biểu đồ Biến động giá chuẩn hóa (%)")
-    fig1 = px.line(
-        df_port,
-        x="Date",
-        y="Norm_Close",
-        color="Ticker",
-        labels={"Date": "Thời gian", "Norm_Close": "Biến động giá (%)", "Close": "Giá (VND)"},
-        hover_data={
-            "Ticker": True,
-            "Date": True,
-            "Close": ":,.0f",
-            "Norm_Close": ":.2f"
-        }
-    )
-    fig1.update_layout(template="plotly_white", hovermode="x unified")
-    st.plotly_chart(fig1, use_container_width=True)
+    def normalized_figure():
+        fig = px.line(
+            df_port,
+            x="Date",
+            y="Norm_Close",
+            color="Ticker",
+            labels={"Date": "Thời gian", "Norm_Close": "Biến động giá (%)", "Close": "Giá (VND)"},
+            hover_data={
+                "Ticker": True,
+                "Date": True,
+                "Close": ":,.0f",
+                "Norm_Close": ":.2f"
+            },
+            render_mode=render_mode
+        )
+        fig.update_layout(template="plotly_white", hovermode="x unified")
+        return fig
+
+    cached_chart(("normalized", tuple(sorted(selected))), normalized_figure, use_container_width=True)
 
 
     st.markdown("""
@@ -483,25 +704,25 @@ def tab_portfolio():
     """, unsafe_allow_html=True)
 
     # --- Biểu đồ 2: Giá thực tế (VND) ---
-    df_port["Tooltip_Value"] = df_port.apply(
-        lambda row: f"{row['Ticker']}<br>Ngày: {row['Date'].strftime('%Y-%m-%d')}<br>Giá: {row['Close']:,.0f} VND", axis=1
-    )
-
     st.subheader("📈 Biểu đồ Giá thực tế (VND)")
-    fig2 = px.line(
-        df_port,
-        x="Date",
-        y="Close",
-        color="Ticker",
-        labels={"Date": "Thời gian", "Close": "Giá (VND)"},
-        hover_data={
-            "Ticker": True,
-            "Date": True,
-            "Close": ":,.0f"
-        }
-    )
-    fig2.update_layout(template="plotly_white", hovermode="x unified")
-    st.plotly_chart(fig2, use_container_width=True)
+    def price_figure():
+        fig = px.line(
+            df_port,
+            x="Date",
+            y="Close",
+            color="Ticker",
+            labels={"Date": "Thời gian", "Close": "Giá (VND)"},
+            hover_data={
+                "Ticker": True,
+                "Date": True,
+                "Close": ":,.0f"
+            },
+            render_mode=render_mode
+        )
+        fig.update_layout(template="plotly_white", hovermode="x unified")
+        return fig
+
+    cached_chart(("price", tuple(sorted(selected))), price_figure, use_container_width=True)
 
     st.markdown("""
     <div style="text-align: justify;">
@@ -515,17 +736,362 @@ def tab_portfolio():
     """, unsafe_allow_html=True)
 
 # ===========================================================
-# 9️⃣ Chạy ứng dụng chính
+# 9️⃣ TAB 6 - PORTFOLIO OPTIMIZATION (tối ưu danh mục Markowitz)
+# ===========================================================
+
+@profiled_cache(st.cache_data(max_entries=64))
+def cached_moments(_panel, version, selection, window):
+    # Khóa cache: (phiên bản dữ liệu, tập mã, cửa sổ ước lượng)
+    return estimate_moments(_panel.close, selection, window)
+
+
+@profiled_cache(st.cache_data(max_entries=64))
+def cached_frontier(_panel, version, selection, window, rf, max_weight):
+    mu, cov = cached_moments(_panel, version, selection, window)
+    return efficient_frontier(mu, cov, selection, rf=rf, max_weight=max_weight)
+
+
+@profiled_cache(st.cache_data(max_entries=16))
+def cached_random_portfolios(_panel, version, selection, window, rf, max_weight, n):
+    mu, cov = cached_moments(_panel, version, selection, window)
+    return random_portfolios(mu, cov, n, rf=rf, max_weight=max_weight)
+
+
+def tab_optimization():
+    import plotly.graph_objects as go
+
+    st.markdown("""
+        <h1 style='text-align: center; color: #1a73e8;'>
+            🧮 Tối ưu danh mục (Markowitz)
+        </h1>
+    """, unsafe_allow_html=True)
+
+    selected = st.multiselect(
+        "📌 Chọn cổ phiếu trong danh mục",
+        tickers,
+        default=PORTFOLIO_DEFAULT
+    )
+    st.session_state["portfolio_selection"] = selected          # dùng lại ở tab Monte Carlo (VaR)
+    if len(selected) < 2:
+        st.warning("⚠️ Vui lòng chọn ít nhất hai mã cổ phiếu.")
+        return
+    selection = tuple(sorted(selected))
+
+    col1, col2, col3, col4 = st.columns(4)
+    windows = {"60 phiên": 60, "120 phiên": 120, "250 phiên": 250, "Toàn bộ": None}
+    window = windows[col1.selectbox("Cửa sổ ước lượng", list(windows), index=2)]
+    max_weight = col2.slider("Tỷ trọng tối đa mỗi mã", 0.05, 1.0, 0.4, step=0.05)
+    rf = col3.number_input("Lãi suất phi rủi ro (năm)", 0.0, 0.2, 0.03, step=0.005, format="%.3f")
+    n_random = col4.select_slider("Số danh mục ngẫu nhiên", [1000, 5000, 20000, 50000, 100000], value=20000)
+
+    max_weight = max(max_weight, 1 / len(selection))
+    profiler.set_rows(sum(len(panel.get(tk)) for tk in selection))
+    frontier = cached_frontier(panel, panel.version, selection, window, rf, max_weight)
+    _, rand_ret, rand_vol, rand_sharpe = cached_random_portfolios(
+        panel, panel.version, selection, window, rf, max_weight, n_random
+    )
+
+    # --- Biểu đồ đường biên hiệu quả ---
+    i_sharpe, i_minvar = frontier.max_sharpe, frontier.min_variance
+    def frontier_figure():
+        fig = go.Figure()
+        fig.add_trace(go.Scattergl(
+            x=rand_vol, y=rand_ret, mode="markers", name="Danh mục ngẫu nhiên",
+            marker=dict(size=3, color=rand_sharpe, colorscale="Viridis", showscale=True,
+                        colorbar=dict(title="Sharpe"), opacity=0.5)
+        ))
+        fig.add_trace(go.Scatter(
+            x=frontier.vols, y=frontier.returns, mode="lines", name="Đường biên hiệu quả",
+            line=dict(color="#d62728", width=3)
+        ))
+        fig.add_trace(go.Scatter(
+            x=[frontier.vols[i_sharpe]], y=[frontier.returns[i_sharpe]], mode="markers",
+            name="Sharpe lớn nhất", marker=dict(symbol="star", size=16, color="#ffa600")
+        ))
+        fig.add_trace(go.Scatter(
+            x=[frontier.vols[i_minvar]], y=[frontier.returns[i_minvar]], mode="markers",
+            name="Phương sai nhỏ nhất", marker=dict(symbol="diamond", size=14, color="#003f5c")
+        ))
+        fig.update_layout(
+            title="Đường biên hiệu quả (lợi nhuận và độ biến động năm hóa)",
+            xaxis_title="Độ biến động (σ năm)", yaxis_title="Lợi nhuận kỳ vọng (năm)",
+            xaxis_tickformat=".0%", yaxis_tickformat=".0%", template="plotly_white"
+        )
+        return fig
+
+    cached_chart(("frontier", selection, window, rf, max_weight, n_random), frontier_figure, use_container_width=True)
+
+    # --- Tỷ trọng hai danh mục tối ưu ---
+    weights_df = pd.DataFrame({
+        "Sharpe lớn nhất": frontier.weights[i_sharpe],
+        "Phương sai nhỏ nhất": frontier.weights[i_minvar],
+    }, index=frontier.tickers)
+    summary_df = pd.DataFrame({
+        "Sharpe lớn nhất": [frontier.returns[i_sharpe], frontier.vols[i_sharpe], frontier.sharpe[i_sharpe]],
+        "Phương sai nhỏ nhất": [frontier.returns[i_minvar], frontier.vols[i_minvar], frontier.sharpe[i_minvar]],
+    }, index=["Lợi nhuận kỳ vọng", "Độ biến động", "Chỉ số Sharpe"])
+
+    col_w, col_s = st.columns(2)
+    col_w.subheader("⚖️ Tỷ trọng")
+    col_w.dataframe(weights_df.style.format("{:.2%}"), use_container_width=True)
+    col_s.subheader("📋 Chỉ tiêu danh mục")
+    col_s.dataframe(summary_df.style.format("{:.4f}"), use_container_width=True)
+
+    st.markdown("""
+    <div style="text-align: justify;">
+    <b>💡 Ghi chú:</b>
+    <ul>
+        <li>Lợi nhuận kỳ vọng và ma trận hiệp phương sai được ước lượng từ lợi nhuận ngày, năm hóa theo 252 phiên.</li>
+        <li>Không bán khống; tỷ trọng mỗi mã không vượt quá mức tối đa đã chọn.</li>
+        <li>Mỗi điểm màu là một danh mục ngẫu nhiên; đường đỏ là tập danh mục tối ưu.</li>
+    </ul>
+    </div>
+    """, unsafe_allow_html=True)
+
+# ===========================================================
+# 🔟 TAB 7 - CORRELATION (tương quan các mã VN30)
 # ===========================================================
 
-if tab == "Summary":
-    tab_summary()
-elif tab == "Chart":
-    tab_chart()
-elif tab == "Statistics":
-    tab_statistics()
-elif tab == "Monte Carlo Simulation":
-    tab_montecarlo()
-elif tab == "Portfolio Trend":
-    tab_portfolio()
+@profiled_cache(st.cache_resource(max_entries=8))
+def cached_rolling_matrices(_panel, version, window):
+    # Tính trước mọi ma trận của cả năm; kéo thanh ngày chỉ đọc lại, không tính lại
+    returns = aligned_returns(_panel.close)
+    return returns, rolling_matrices(returns, window)
+
+
+def tab_correlation():
+    import plotly.graph_objects as go
+
+    st.markdown("""
+        <h1 style='text-align: center; color: #1a73e8;'>
+            🔗 Tương quan giữa các mã VN30
+        </h1>
+    """, unsafe_allow_html=True)
+
+    col1, col2 = st.columns(2)
+    window = col1.selectbox("Cửa sổ trượt (phiên)", [20, 60, 120], index=1)
+    measure = col2.radio("Ma trận", ["Tương quan", "Hiệp phương sai (năm hóa)"], horizontal=True)
+
+    returns, rolling = cached_rolling_matrices(panel, panel.version, window)
+    profiler.set_rows(returns.size)
+    if len(rolling.dates) == 0:
+        st.warning("⚠️ Không đủ dữ liệu cho cửa sổ đã chọn.")
+        return
+
+    options = ["Toàn kỳ"] + [d.strftime("%Y-%m-%d") for d in rolling.dates]
+    choice = st.select_slider("📅 Ngày cuối cửa sổ", options=options, value=options[-1])
+
+    if choice == "Toàn kỳ":
+        matrix = returns.corr() if measure == "Tương quan" else returns.cov() * TRADING_DAYS
+        matrix = matrix.to_numpy()
+        title = "toàn kỳ"
+    else:
+        cov, corr = rolling.at(pd.Timestamp(choice))
+        matrix = corr if measure == "Tương quan" else cov
+        title = f"{window} phiên đến {choice}"
+
+    def matrix_figure():
+        is_corr = measure == "Tương quan"
+        fig = go.Figure(go.Heatmap(
+            z=matrix, x=rolling.tickers, y=rolling.tickers,
+            colorscale="RdBu_r", zmid=0 if is_corr else None,
+            zmin=-1 if is_corr else None, zmax=1 if is_corr else None,
+            hovertemplate="%{y} – %{x}: %{z:.3f}<extra></extra>"
+        ))
+        fig.update_layout(
+            title=f"{measure} ({title})", template="plotly_white",
+            height=700, yaxis=dict(autorange="reversed")
+        )
+        return fig
+
+    cached_chart(("matrix", window, measure, choice), matrix_figure, use_container_width=True)
+
+    st.markdown("""
+    <div style="text-align: justify;">
+    <b>💡 Ghi chú:</b>
+    <ul>
+        <li>Tính trên lợi nhuận ngày, chỉ dùng các phiên mà mọi mã đều có dữ liệu.</li>
+        <li>Tương quan gần 1: hai mã biến động cùng chiều; gần −1: ngược chiều.</li>
+        <li>Kéo thanh ngày để xem tương quan thay đổi theo thời gian.</li>
+    </ul>
+    </div>
+    """, unsafe_allow_html=True)
+
+# ===========================================================
+# 1️⃣1️⃣ TAB 8 - LIVE (giá trong phiên, cập nhật trực tiếp)
+# ===========================================================
+
+LIVE_SOURCES = ["Yahoo Finance (nến 1 phút)", "Giả lập (offline)"]
+
+
+@profiled_cache(st.cache_resource(max_entries=4))
+def get_live_feed(_panel, version, source_name):
+    # Một feed dùng chung cho mọi phiên; dữ liệu ngày đổi phiên bản thì tạo feed mới
+    if source_name == LIVE_SOURCES[0]:
+        source = yfinance_quotes("1m")
+    else:
+        anchor = {f"{tk}.VN": df["Close"].iloc[-1] for tk, df in _panel.frames.items()}
+        source = synthetic_quotes(anchor)
+    return LiveFeed(_panel, source)
+
+
+def tab_live():
+    import plotly.graph_objects as go
+
+    st.title("📡 Giá trực tiếp trong phiên")
+    col1, col2 = st.columns(2)
+    source_name = col1.radio("Nguồn giá", LIVE_SOURCES, horizontal=True)
+    interval = col2.select_slider("Chu kỳ cập nhật (giây)", [2, 5, 10, 30, 60], value=5)
+    feed = get_live_feed(panel, panel.version, source_name)
+    profiler.set_rows(len(feed.frames.get(ticker, ())))
+    params = feed.engine.params
+    sma_names = [f"SMA {w}" for w in params.sma]
+    selected = st.multiselect("Chọn chỉ báo", sma_names + [f"EMA {s}" for s in params.ema], default=sma_names)
+
+    # Chỉ phần này chạy lại theo chu kỳ (không chạy lại toàn bộ script)
+    @st.fragment(run_every=interval)
+    def live_view():
+        feed.poll(min_interval=interval)
+        if feed.last_error:
+            st.warning(f"⚠️ Không lấy được giá mới: {feed.last_error}")
+        if feed.get(ticker) is None:
+            st.warning("⚠️ Không có dữ liệu cho mã cổ phiếu này.")
+            return
+
+        metrics = feed.metrics(ticker)
+        col1, col2, col3 = st.columns(3)
+        col1.metric("💰 Giá mới nhất", f"{metrics['latest_close']:,.2f} VND")
+        col2.metric("📆 Trung bình 30 nến gần nhất", f"{metrics['mean_30d']:,.2f} VND")
+        col3.metric("📉 Độ lệch chuẩn lợi nhuận (σ)", f"{metrics['std_return']:.2%}")
+
+        df_ind = downsample(feed.engine.get(ticker), budget, y="_close")
+        fig = go.Figure(go.Scatter(x=df_ind["Date"], y=df_ind["_close"], mode="lines", name="Close"))
+        for name in selected:
+            fig.add_trace(go.Scatter(x=df_ind["Date"], y=df_ind[name.replace(" ", "_")], mode="lines", name=name))
+        fig.update_layout(title=f"Giá {ticker} (lịch sử + trong phiên)", template="plotly_white", height=450)
+        plotly_chart(fig, use_container_width=True)
+        st.caption(
+            f"🕒 Cập nhật lúc {datetime.now():%H:%M:%S} · đã thêm {feed.n_bars:,} nến trong phiên "
+            f"· nến cuối: {feed.get(ticker)['Date'].iloc[-1]:%Y-%m-%d %H:%M}"
+        )
+
+    live_view()
+
+# ===========================================================
+# 1️⃣2️⃣ TAB 9 - BACKTEST (kiểm định giao cắt SMA)
+# ===========================================================
+
+@profiled_cache(st.cache_resource(max_entries=4))
+def cached_backtest(_panel, version, combos, fee, sell_tax):
+    # Cả lưới (tổ hợp × phiên × mã) tính một lần; đổi mã chỉ đọc lại kết quả
+    return backtest_sma_grid(_panel.close, list(combos), fee=fee, sell_tax=sell_tax)
+
+
+def tab_backtest():
+    import plotly.graph_objects as go
+
+    st.title("🧪 Kiểm định chiến lược giao cắt SMA")
+    col1, col2, col3 = st.columns(3)
+    fast_lo, fast_hi = col1.slider("SMA nhanh (phiên)", 5, 100, (5, 50), step=5)
+    slow_lo, slow_hi = col2.slider("SMA chậm (phiên)", 20, 250, (20, 200), step=20)
+    fee = col3.number_input("Phí giao dịch mỗi chiều (%)", 0.0, 1.0, 0.15, step=0.05) / 100
+    combos = tuple(sma_grid(range(fast_lo, fast_hi + 1, 5), range(slow_lo, slow_hi + 1, 20)))
+    if not combos:
+        st.warning("⚠️ Cần SMA nhanh nhỏ hơn SMA chậm.")
+        return
+
+    profiler.set_rows(panel.close.size)
+    result = cached_backtest(panel, panel.version, combos, fee, 0.001)
+    st.caption(
+        f"{len(combos)} tổ hợp × {len(result.tickers)} mã · thuế bán 0,1% · "
+        "thanh toán T+2.5 (mua phiên t, sớm nhất bán phiên t+2)"
+    )
+
+    st.subheader("🏆 Tổ hợp tốt nhất của từng mã (theo Sharpe)")
+    st.dataframe(
+        result.best().style.format({
+            "Lợi_nhuận": "{:.2%}", "CAGR": "{:.2%}", "Sharpe": "{:.2f}",
+            "Sụt_giảm_tối_đa": "{:.2%}", "Thời_gian_nắm_giữ": "{:.0%}", "Mua_giữ": "{:.2%}"
+        }),
+        use_container_width=True, hide_index=True
+    )
+
+    stats = result.stats[result.stats["Ticker"] == ticker]
+    grid = stats.pivot(index="Nhanh", columns="Chậm", values="Sharpe")
+    def sharpe_grid_figure():
+        fig = go.Figure(go.Heatmap(
+            z=grid.to_numpy(), x=grid.columns, y=grid.index, colorscale="RdYlGn", zmid=0,
+            hovertemplate="SMA %{y} / %{x}: Sharpe %{z:.2f}<extra></extra>"
+        ))
+        fig.update_layout(title=f"Sharpe theo tham số của {ticker}", xaxis_title="SMA chậm",
+                          yaxis_title="SMA nhanh", template="plotly_white", height=450)
+        return fig
+
+    cached_chart(("sharpe_grid", ticker, combos, fee), sharpe_grid_figure, use_container_width=True)
+
+    best = stats.loc[stats["Sharpe"].idxmax()] if stats["Sharpe"].notna().any() else stats.iloc[0]
+    fast, slow = int(best["Nhanh"]), int(best["Chậm"])
+    def equity_figure():
+        curve = result.curve(fast, slow, ticker)
+        hold = panel.close[ticker] / panel.close[ticker].bfill().iloc[0]
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=curve.index, y=curve, mode="lines", name=f"SMA {fast}/{slow}"))
+        fig.add_trace(go.Scatter(x=hold.index, y=hold, mode="lines", name="Mua & giữ"))
+        fig.update_layout(title=f"Đường tài sản của {ticker} (bắt đầu = 1)", template="plotly_white", height=450)
+        return fig
+
+    cached_chart(("equity", ticker, combos, fee), equity_figure, use_container_width=True)
+
+# ===========================================================
+# 1️⃣3️⃣ Chạy ứng dụng chính
+# ===========================================================
+
+profiler.context.update(tab=tab, ticker=ticker)
+with profiler.phase(f"tab:{tab}"):       # số dòng do từng tab ghi (profiler.set_rows)
+    if tab == "Summary":
+        tab_summary()
+    elif tab == "Chart":
+        tab_chart()
+    elif tab == "Statistics":
+        tab_statistics()
+    elif tab == "Monte Carlo Simulation":
+        tab_montecarlo()
+    elif tab == "Portfolio Trend":
+        tab_portfolio()
+    elif tab == "Portfolio Optimization":
+        tab_optimization()
+    elif tab == "Correlation":
+        tab_correlation()
+    elif tab == "Live":
+        tab_live()
+    elif tab == "Backtest":
+        tab_backtest()
+
+# ===========================================================
+# 1️⃣4️⃣ Bảng chẩn đoán hiệu năng (tùy chọn)
+# ===========================================================
 
+st.sidebar.checkbox("🩺 Chẩn đoán hiệu năng", key="diagnostics")
+if profiler.enabled:
+    diag = profiler.summary()
+    with st.sidebar.expander("🩺 Chẩn đoán hiệu năng", expanded=True):
+        st.metric("⏱️ Tổng thời gian chạy", f"{diag['total_s'] * 1000:,.0f} ms")
+        st.write(
+            f"Cache: **{diag['cache_hits']}** hit / **{diag['cache_misses']}** miss "
+            f"({diag['cache_miss_s'] * 1000:,.0f} ms khi miss)"
+        )
+        st.write(
+            f"Biểu đồ: **{diag['figures']}** hình, "
+            f"**{diag['figure_bytes'] / 1024:,.0f} KB** JSON "
+            f"({diag['figure_serialize_s'] * 1000:,.0f} ms tuần tự hóa)"
+        )
+        figure_cache = get_figure_cache()
+        st.write(
+            f"Cache biểu đồ: **{len(figure_cache)}** hình, "
+            f"**{figure_cache.nbytes / 2 ** 20:,.1f} / {figure_cache.max_bytes / 2 ** 20:,.0f} MB**, "
+            f"{figure_cache.hits} hit / {figure_cache.misses} miss, {figure_cache.evictions} lần loại bỏ"
+        )
+        events = pd.DataFrame(profiler.events)
+        events["wall_ms"] = events.pop("wall_s") * 1000
+        st.dataframe(events, use_container_width=True, hide_index=True)
+    profiler.flush()
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from vn30_analytics import IndicatorEngine, compute_indicators
+from vn30_data import build_panel, fetch_vn30, synthetic_provider
+
+INDICATOR_COLUMNS = ["SMA_20", "SMA_50", "EMA_20", "RSI_14", "MACD", "MACD_signal",
+                     "MACD_hist", "BB_mid", "BB_upper", "BB_lower"]
+RTOL = 1e-6     # giá trong panel là float32 (~7 chữ số có nghĩa)
+
+
+@pytest.fixture(scope="module")
+def data():
+    symbols = ["AAA.VN", "BBB.VN", "CCC.VN"]
+    return fetch_vn30(symbols, provider=synthetic_provider(n_days=300, seed=3)).data
+
+
+def _full(panel):
+    table = compute_indicators(panel.data)
+    return {tk: df.reset_index(drop=True) for tk, df in table.groupby("Ticker", observed=True)}
+
+
+def test_indicator_engine_sync_appends_incrementally(data):
+    cutoff = data["Date"].sort_values().unique()[-15]
+    old = build_panel(data[data["Date"] <= cutoff])
+    new = build_panel(data)
+
+    engine = IndicatorEngine().sync(old)
+    assert engine._appended_rows(new)       # đúng nhánh cập nhật tăng dần
+    engine.sync(new)
+
+    expected = _full(new)
+    for tk in new.tickers:
+        got = engine.get(tk)
+        assert len(got) == len(expected[tk])
+        np.testing.assert_allclose(got[INDICATOR_COLUMNS], expected[tk][INDICATOR_COLUMNS], rtol=RTOL)
+
+
+def test_indicator_engine_append_matches_recompute(data):
+    cutoff = data["Date"].sort_values().unique()[-5]
+    engine = IndicatorEngine().sync(build_panel(data[data["Date"] <= cutoff]))
+
+    new = build_panel(data)
+    new_rows = {tk: df[df["Date"] > cutoff] for tk, df in new.frames.items()}
+    engine.append(new_rows, "live")
+
+    expected = _full(new)
+    for tk in new.tickers:
+        np.testing.assert_allclose(engine.get(tk)[INDICATOR_COLUMNS], expected[tk][INDICATOR_COLUMNS], rtol=RTOL)
@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+
+from vn30_analytics import RunningSummary, summary_metrics
+from vn30_data import build_panel, fetch_vn30, synthetic_provider
+from vn30_live import LiveFeed, synthetic_quotes
+
+SESSION = pd.Timestamp("2026-10-14")        # thứ Tư cố định: không phụ thuộc đồng hồ hệ thống
+RTOL = 1e-6                                 # giá trong panel là float32 (~7 chữ số có nghĩa)
+
+
+def test_live_feed_replaces_partial_daily_bar_of_current_session():
+    data = fetch_vn30(["AAA.VN", "BBB.VN"], provider=synthetic_provider(n_days=120, end=SESSION)).data
+    panel = build_panel(data)
+    assert panel.get("AAA")["Date"].iloc[-1] == SESSION    # nến ngày của phiên đang diễn ra
+
+    anchor = {f"{tk}.VN": df["Close"].iloc[-1] for tk, df in panel.frames.items()}
+    quotes = synthetic_quotes(anchor, start=SESSION + pd.Timedelta("9h15min"))
+    feed = LiveFeed(panel, quotes, session=SESSION)
+    for _ in range(3):
+        feed.poll()
+
+    df = feed.get("AAA")
+    assert feed.session == SESSION
+    assert df["Date"].iloc[-1].normalize() == SESSION
+    assert not (df["Date"] == SESSION).any()                # không còn nến ngày 00:00 của phiên
+    assert (df["Date"] >= SESSION).sum() == 3
+    assert len(feed.engine.get("AAA")) == len(df)
+
+
+def test_running_summary_matches_summary_metrics():
+    data = fetch_vn30(["AAA.VN"], provider=synthetic_provider(n_days=300, seed=3)).data
+    df = build_panel(data).get("AAA")
+    closes = df["Close"].to_numpy()
+    running = RunningSummary(closes[:200])
+    for close in closes[200:]:
+        running.update(close)
+
+    got, expected = running.metrics(), summary_metrics(df)
+    for key in expected:
+        assert got[key] == pytest.approx(expected[key], rel=RTOL)
@@ -0,0 +1,13 @@
+from vn30_data import PANEL_BYTES_PER_TICKER_YEAR, build_panel, fetch_vn30, synthetic_provider
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+def test_panel_bytes_per_ticker_year_within_budget():
+    n_tickers, years = 30, 20
+    symbols = [f"T{i:02d}.VN" for i in range(n_tickers)]
+    provider = synthetic_provider(n_days=years * TRADING_DAYS_PER_YEAR, seed=1)
+    panel = build_panel(fetch_vn30(symbols, provider=provider).data)
+
+    assert len(panel.tickers) == n_tickers
+    assert panel.nbytes / (n_tickers * years) <= PANEL_BYTES_PER_TICKER_YEAR
@@ -0,0 +1,20 @@
+import numpy as np
+import pandas as pd
+
+from vn30_analytics import TRADING_DAYS, rolling_matrices
+
+
+def test_rolling_matrices_match_pandas_rolling():
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2020-01-01", periods=400)
+    returns = pd.DataFrame(rng.normal(0, 0.02, (400, 4)), index=dates, columns=list("ABCD"))
+    window = 60
+
+    result = rolling_matrices(returns, window)
+
+    k = returns.shape[1]
+    cov = returns.rolling(window).cov().dropna().to_numpy().reshape(-1, k, k)
+    corr = returns.rolling(window).corr().dropna().to_numpy().reshape(-1, k, k)
+    assert list(result.dates) == list(dates[window - 1:])
+    np.testing.assert_allclose(result.cov, cov * TRADING_DAYS, rtol=1e-8, atol=1e-12)
+    np.testing.assert_allclose(result.corr, corr, rtol=1e-8, atol=1e-10)
@@ -0,0 +1,592 @@
+# ===========================================================
+# File: vn30_analytics.py
+# Các hàm tính toán dùng chung cho dashboard (không phụ thuộc Streamlit)
+# ===========================================================
+
+import threading
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# ===========================================================
+# 1️⃣ Mô phỏng Monte Carlo (vector hóa bằng NumPy)
+# ===========================================================
+
+MC_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def _growth(shocks, daily_vol, drift, gbm):
+    """Hệ số tăng trưởng mỗi bước từ ma trận nhiễu chuẩn."""
+    if gbm:
+        return np.exp((drift - 0.5 * daily_vol ** 2) + daily_vol * shocks)
+    return 1 + drift + daily_vol * shocks
+
+
+def simulate_percentiles(last_price, daily_vol, n_sim, horizon, drift=0.0, gbm=False,
+                         seed=42, percentiles=MC_PERCENTILES, max_cells=4_000_000):
+    """Các dải phân vị của giá mô phỏng theo từng ngày.
+
+    Ma trận nhiễu được sinh theo khối nhiều ngày một lúc, tối đa `max_cells`
+    phần tử (n_sim × số ngày trong khối), nên bộ nhớ không tăng theo horizon.
+    Trả về (bands, final): bands là DataFrame index = ngày (0..horizon),
+    cột = "P5", "P25", ...; final là mảng giá cuối kỳ của mọi đường.
+    """
+    rng = np.random.default_rng(seed)
+    steps_per_chunk = max(1, max_cells // n_sim)
+
+    bands = np.empty((horizon + 1, len(percentiles)))
+    bands[0] = last_price
+    current = np.full(n_sim, float(last_price))
+
+    # Khối được xếp theo (ngày × đường) để mỗi hàng liền bộ nhớ khi tính phân vị
+    t = 0
+    while t < horizon:
+        k = min(steps_per_chunk, horizon - t)
+        shocks = rng.standard_normal((k, n_sim))
+        paths = current * np.cumprod(_growth(shocks, daily_vol, drift, gbm), axis=0)
+        bands[t + 1:t + 1 + k] = np.percentile(paths, percentiles, axis=1).T
+        current = paths[-1]
+        t += k
+
+    columns = [f"P{p}" for p in percentiles]
+    return pd.DataFrame(bands, columns=columns), current
+
+
+# ===========================================================
+# 2️⃣ Chỉ báo kỹ thuật cho mọi mã (SMA/EMA/RSI/MACD/Bollinger)
+# ===========================================================
+# compute_indicators tính cả bảng trong một lượt groupby (Cython, không lặp
+# theo dòng). IndicatorEngine ghi nhớ kết quả theo phiên bản dữ liệu và khi
+# chỉ có thêm phiên mới thì cập nhật tiếp từ trạng thái cuối (EMA, RSI, MACD
+# là công thức đệ quy; SMA/Bollinger chỉ cần cửa sổ giá gần nhất).
+
+@dataclass(frozen=True)
+class IndicatorParams:
+    sma: tuple = (20, 50)
+    ema: tuple = (20,)
+    rsi: int = 14
+    macd: tuple = (12, 26, 9)        # (nhanh, chậm, tín hiệu)
+    bb: tuple = (20, 2.0)            # (cửa sổ, số độ lệch chuẩn)
+
+    @property
+    def max_window(self):
+        return max(self.sma + (self.bb[0],))
+
+
+def _alpha(span):
+    return 2 / (span + 1)
+
+
+def compute_indicators(data, params=IndicatorParams()):
+    """Tính toàn bộ chỉ báo cho bảng dạng dài đã sắp xếp theo (Ticker, Date).
+
+    Trả về DataFrame cùng index với `data`, gồm Ticker, Date và các cột chỉ
+    báo, kèm các cột trạng thái nội bộ bắt đầu bằng "_" (dùng khi cập nhật).
+    """
+    key = data["Ticker"]
+    close = data["Close"]
+    g = close.groupby(key, sort=False, observed=True)
+
+    def rolling(series, window, how):
+        r = series.groupby(key, sort=False, observed=True).rolling(window)
+        r = r.std(ddof=0) if how == "std" else r.mean()
+        return r.reset_index(level=0, drop=True)
+
+    def ewm(series, alpha):
+        r = series.groupby(key, sort=False, observed=True).ewm(alpha=alpha, adjust=False).mean()
+        return r.reset_index(level=0, drop=True)
+
+    out = pd.DataFrame({"Ticker": key, "Date": data["Date"]}, index=data.index)
+    for w in params.sma:
+        out[f"SMA_{w}"] = rolling(close, w, "mean")
+    for s in params.ema:
+        out[f"EMA_{s}"] = ewm(close, _alpha(s))
+
+    # RSI theo cách làm trơn của Wilder (alpha = 1/n)
+    delta = g.diff()
+    out["_gain"] = ewm(delta.clip(lower=0), 1 / params.rsi)
+    out["_loss"] = ewm(-delta.clip(upper=0), 1 / params.rsi)
+    out[f"RSI_{params.rsi}"] = 100 - 100 / (1 + out["_gain"] / out["_loss"])
+
+    fast, slow, signal = params.macd
+    out["_ema_fast"] = ewm(close, _alpha(fast))
+    out["_ema_slow"] = ewm(close, _alpha(slow))
+    out["MACD"] = out["_ema_fast"] - out["_ema_slow"]
+    out["MACD_signal"] = ewm(out["MACD"], _alpha(signal))
+    out["MACD_hist"] = out["MACD"] - out["MACD_signal"]
+
+    window, k = params.bb
+    mid = rolling(close, window, "mean")
+    std = rolling(close, window, "std")
+    out["BB_mid"] = mid
+    out["BB_upper"] = mid + k * std
+    out["BB_lower"] = mid - k * std
+    return out
+
+
+def _ewm_step(state, x, alpha):
+    """Một bước EMA (adjust=False); trạng thái NaN thì lấy giá trị đầu tiên."""
+    if np.isnan(x):
+        return state
+    return x if np.isnan(state) else state + alpha * (x - state)
+
+
+def _extend_indicators(prev, closes, dates, params):
+    """Tính chỉ báo cho các phiên mới của một mã từ dòng cuối `prev`."""
+    fast, slow, signal = params.macd
+    window, k = params.bb
+    last = prev.iloc[-1]
+    tail = prev["_close"].to_numpy()[-params.max_window:]
+
+    state = {c: last[c] for c in prev.columns if c.startswith(("EMA_", "_"))}
+    state["MACD_signal"] = last["MACD_signal"]
+    rows = []
+    for x, date in zip(closes, dates):
+        delta = x - state["_close"]
+        state["_gain"] = _ewm_step(state["_gain"], max(delta, 0.0), 1 / params.rsi)
+        state["_loss"] = _ewm_step(state["_loss"], max(-delta, 0.0), 1 / params.rsi)
+        for s in params.ema:
+            state[f"EMA_{s}"] = _ewm_step(state[f"EMA_{s}"], x, _alpha(s))
+        state["_ema_fast"] = _ewm_step(state["_ema_fast"], x, _alpha(fast))
+        state["_ema_slow"] = _ewm_step(state["_ema_slow"], x, _alpha(slow))
+        macd = state["_ema_fast"] - state["_ema_slow"]
+        state["MACD_signal"] = _ewm_step(state["MACD_signal"], macd, _alpha(signal))
+        state["_close"] = x
+
+        tail = np.append(tail, x)[-params.max_window:]
+        row = {"Ticker": last["Ticker"], "Date": date}
+        for w in params.sma:
+            row[f"SMA_{w}"] = tail[-w:].mean() if len(tail) >= w else np.nan
+        row.update({c: v for c, v in state.items() if c.startswith(("EMA_", "_"))})
+        row[f"RSI_{params.rsi}"] = 100 - 100 / (1 + state["_gain"] / state["_loss"]) if state["_loss"] else 100.0
+        row["MACD"] = macd
+        row["MACD_signal"] = state["MACD_signal"]
+        row["MACD_hist"] = macd - state["MACD_signal"]
+        if len(tail) >= window:
+            mid, std = tail[-window:].mean(), tail[-window:].std()
+            row.update(BB_mid=mid, BB_upper=mid + k * std, BB_lower=mid - k * std)
+        else:
+            row.update(BB_mid=np.nan, BB_upper=np.nan, BB_lower=np.nan)
+        rows.append(row)
+
+    new = pd.DataFrame(rows, columns=prev.columns)
+    return pd.concat([prev, new], ignore_index=True)
+
+
+class IndicatorEngine:
+    """Bảng chỉ báo của mọi mã, ghi nhớ theo phiên bản dữ liệu của panel."""
+
+    def __init__(self, params=IndicatorParams()):
+        self.params = params
+        self.version = None
+        self.frames = {}
+        self._lock = threading.Lock()
+
+    def get(self, ticker):
+        return self.frames.get(ticker)
+
+    def sync(self, panel):
+        """Đồng bộ với panel: bỏ qua nếu cùng phiên bản, cập nhật tăng dần nếu
+        chỉ có thêm phiên mới ở cuối, ngược lại tính lại toàn bộ."""
+        with self._lock:
+            if panel.version == self.version:
+                return self
+            new_rows = self._appended_rows(panel)
+            if new_rows is None:
+                table = compute_indicators(panel.data, self.params)
+                table["_close"] = panel.data["Close"]
+                self.frames = _split_by_ticker(table)
+            else:
+                self._extend(new_rows)
+            self.version = panel.version
+            return self
+
+    def append(self, new_rows, version):
+        """Thêm các phiên mới {mã: khung Date/Close} vào cuối (chế độ trực tiếp)."""
+        with self._lock:
+            self._extend(new_rows)
+            self.version = version
+            return self
+
+    def _extend(self, new_rows):
+        for tk, rows in new_rows.items():
+            self.frames[tk] = _extend_indicators(
+                self.frames[tk], rows["Close"].to_numpy(), rows["Date"], self.params
+            )
+
+    def _appended_rows(self, panel):
+        """Các phiên mới của từng mã, hoặc None nếu lịch sử cũ đã thay đổi."""
+        if not self.frames or set(self.frames) != set(panel.frames):
+            return None
+        new_rows = {}
+        for tk, df in panel.frames.items():
+            prev = self.frames[tk]
+            last_date = prev["Date"].iloc[-1]
+            n_old = int((df["Date"] <= last_date).sum())
+            if n_old != len(prev) or df["Close"].iloc[n_old - 1] != prev["_close"].iloc[-1]:
+                return None
+            if n_old < len(df):
+                new_rows[tk] = df.iloc[n_old:]
+        return new_rows
+
+
+def _split_by_ticker(table):
+    return {tk: df.reset_index(drop=True) for tk, df in table.groupby("Ticker", sort=False, observed=True)}
+
+
+# ===========================================================
+# 3️⃣ Tối ưu danh mục trung bình – phương sai (Markowitz)
+# ===========================================================
+# Ước lượng lợi nhuận kỳ vọng / hiệp phương sai (năm hóa) từ giá đóng cửa,
+# đánh giá hàng loạt danh mục ngẫu nhiên bằng một phép nhân ma trận và dựng
+# đường biên hiệu quả với ràng buộc không bán khống + tỷ trọng tối đa.
+
+TRADING_DAYS = 252
+
+
+def estimate_moments(close, tickers, window=None):
+    """(mu, cov) năm hóa của các mã từ bảng rộng Date × Ticker giá đóng cửa.
+
+    `window`: số phiên gần nhất dùng để ước lượng (None = toàn bộ).
+    """
+    returns = close[list(tickers)].pct_change().dropna(how="any")
+    if window:
+        returns = returns.tail(window)
+    mu = returns.mean().to_numpy() * TRADING_DAYS
+    cov = returns.cov().to_numpy() * TRADING_DAYS
+    return mu, cov
+
+
+def portfolio_stats(weights, mu, cov, rf=0.0):
+    """Lợi nhuận, độ biến động và Sharpe của nhiều danh mục (mỗi hàng một bộ tỷ trọng)."""
+    weights = np.atleast_2d(weights)
+    ret = weights @ mu
+    vol = np.sqrt(((weights @ cov) * weights).sum(axis=1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = (ret - rf) / vol
+    return ret, vol, sharpe
+
+
+def random_portfolios(mu, cov, n, rf=0.0, max_weight=1.0, seed=42):
+    """Sinh n bộ tỷ trọng ngẫu nhiên (Dirichlet) và đánh giá trong một lượt."""
+    rng = np.random.default_rng(seed)
+    weights = rng.dirichlet(np.ones(len(mu)), size=n)
+    if max_weight < 1.0:
+        weights = _project_capped_simplex(weights, max_weight)
+    ret, vol, sharpe = portfolio_stats(weights, mu, cov, rf)
+    return weights, ret, vol, sharpe
+
+
+def _project_capped_simplex(v, cap, n_iter=40):
+    """Chiếu từng hàng của v lên {w : Σw = 1, 0 ≤ w ≤ cap} (chia đôi theo τ)."""
+    lo = (v.min(axis=1) - cap)[:, None]
+    hi = v.max(axis=1)[:, None]
+    for _ in range(n_iter):
+        tau = (lo + hi) / 2
+        too_big = np.clip(v - tau, 0, cap).sum(axis=1, keepdims=True) > 1
+        lo = np.where(too_big, tau, lo)
+        hi = np.where(too_big, hi, tau)
+    return np.clip(v - (lo + hi) / 2, 0, cap)
+
+
+@dataclass
+class Frontier:
+    tickers: list
+    weights: np.ndarray      # (số điểm × số mã)
+    returns: np.ndarray
+    vols: np.ndarray
+    sharpe: np.ndarray
+
+    @property
+    def min_variance(self):
+        return int(np.argmin(self.vols))
+
+    @property
+    def max_sharpe(self):
+        return int(np.nanargmax(self.sharpe))
+
+
+def efficient_frontier(mu, cov, tickers, rf=0.0, max_weight=1.0, n_points=40, n_iter=400):
+    """Đường biên hiệu quả: min wᵀΣw − λ·μᵀw cho dãy λ, giải đồng thời bằng
+    gradient chiếu có gia tốc (FISTA) trên toàn bộ lưới λ.
+
+    Danh mục phương sai nhỏ nhất ứng với λ = 0; Sharpe lớn nhất chọn trên đường biên.
+    """
+    k = len(mu)
+    max_weight = max(max_weight, 1.0 / k)
+    scale = np.mean(np.diag(cov)) / (np.mean(np.abs(mu)) + 1e-12)
+    lambdas = np.concatenate([[0.0], np.logspace(-2, 1.5, n_points - 1) * scale])[:, None]
+
+    step = 1 / (2 * np.linalg.eigvalsh(cov).max())
+    w = np.full((n_points, k), 1.0 / k)
+    z, t = w, 1.0
+    for _ in range(n_iter):
+        grad = 2 * z @ cov - lambdas * mu
+        w_next = _project_capped_simplex(z - step * grad, max_weight)
+        t_next = (1 + np.sqrt(1 + 4 * t * t)) / 2
+        z = w_next + ((t - 1) / t_next) * (w_next - w)
+        w, t = w_next, t_next
+
+    ret, vol, sharpe = portfolio_stats(w, mu, cov, rf)
+    return Frontier(list(tickers), w, ret, vol, sharpe)
+
+
+# ===========================================================
+# 4️⃣ Bộ lọc toàn thị trường (screener)
+# ===========================================================
+
+def _grouped_kurt(values, key, n):
+    """Độ nhọn (excess, hiệu chỉnh mẫu như Series.kurt) theo nhóm, không dùng apply."""
+    centered = values - values.groupby(key, sort=False, observed=True).transform("mean")
+    s2 = (centered ** 2).groupby(key, sort=False, observed=True).sum()
+    s4 = (centered ** 4).groupby(key, sort=False, observed=True).sum()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        adj = (n - 2) * (n - 3)
+        return n * (n + 1) * (n - 1) * s4 / (adj * s2 ** 2) - 3 * (n - 1) ** 2 / adj
+
+
+def screen_universe(data):
+    """Thống kê lợi nhuận ngày của mọi mã trong một lượt groupby.
+
+    `data` là bảng dạng dài sắp xếp theo (Ticker, Date). Các cột giống bảng
+    mô tả của tab Statistics, thêm độ biến động năm hóa và mức sụt giảm tối đa.
+    """
+    key = data["Ticker"]
+    close = data["Close"]
+    returns = close.groupby(key, sort=False, observed=True).pct_change()
+    g = returns.groupby(key, sort=False, observed=True)
+
+    table = g.agg(["count", "mean", "std", "min", "max", "skew"])
+    table["kurt"] = _grouped_kurt(returns, key, table["count"])
+    quartiles = g.quantile([0.25, 0.5, 0.75]).unstack()
+    table["25%"], table["50%"], table["75%"] = quartiles[0.25], quartiles[0.5], quartiles[0.75]
+
+    table["Sharpe"] = table["mean"] / table["std"]
+    table["Vol_năm"] = table["std"] * np.sqrt(TRADING_DAYS)
+
+    drawdown = close / close.groupby(key, sort=False, observed=True).cummax() - 1
+    table["Sụt_giảm_tối_đa"] = drawdown.groupby(key, sort=False, observed=True).min()
+    first_last = close.groupby(key, sort=False, observed=True).agg(["first", "last"])
+    table["Lợi_nhuận_kỳ"] = first_last["last"] / first_last["first"] - 1
+
+    columns = ["count", "mean", "std", "min", "25%", "50%", "75%", "max",
+               "skew", "kurt", "Sharpe", "Vol_năm", "Sụt_giảm_tối_đa", "Lợi_nhuận_kỳ"]
+    return table[columns]
+
+
+# ===========================================================
+# 5️⃣ Tương quan / hiệp phương sai trượt
+# ===========================================================
+# Giữ tổng Σx và Σxxᵀ của cửa sổ; mỗi ngày mới cộng tích ngoài của ngày đó
+# và trừ tích ngoài của ngày rời khỏi cửa sổ (O(k²) mỗi bước thay vì O(w·k²)).
+# Định kỳ tính lại chính xác từ bộ đệm để sai số cộng dồn không tích lũy.
+
+def aligned_returns(close, tickers=None):
+    """Ma trận lợi nhuận ngày Date × Ticker, chỉ giữ các phiên đủ dữ liệu mọi mã."""
+    close = close[list(tickers)] if tickers is not None else close
+    return close.pct_change().iloc[1:].dropna(how="any")
+
+
+class RollingCovariance:
+    def __init__(self, n_assets, window, resync_every=256):
+        self.window = window
+        self.resync_every = resync_every
+        self._buf = np.zeros((window, n_assets))
+        self._pos = 0           # vị trí ghi kế tiếp trong bộ đệm vòng
+        self._count = 0
+        self._since_resync = 0
+        self._s1 = np.zeros(n_assets)
+        self._s2 = np.zeros((n_assets, n_assets))
+
+    @property
+    def ready(self):
+        return self._count >= self.window
+
+    def push(self, x):
+        """Thêm lợi nhuận một ngày (vector k mã) vào cửa sổ."""
+        x = np.asarray(x, dtype=float)
+        if self.ready:
+            old = self._buf[self._pos]
+            self._s1 -= old
+            self._s2 -= np.outer(old, old)
+        self._buf[self._pos] = x
+        self._s1 += x
+        self._s2 += np.outer(x, x)
+        self._pos = (self._pos + 1) % self.window
+        self._count += 1
+
+        self._since_resync += 1
+        if self._since_resync >= self.resync_every and self.ready:
+            self._s1 = self._buf.sum(axis=0)
+            self._s2 = self._buf.T @ self._buf
+            self._since_resync = 0
+
+    def cov(self):
+        n = min(self._count, self.window)
+        return (self._s2 - np.outer(self._s1, self._s1) / n) / (n - 1)
+
+    def corr(self):
+        cov = self.cov()
+        std = np.sqrt(np.diag(cov))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return cov / np.outer(std, std)
+
+
+@dataclass
+class RollingMatrices:
+    tickers: list
+    dates: pd.DatetimeIndex      # ngày cuối của mỗi cửa sổ
+    cov: np.ndarray              # (số cửa sổ × k × k), năm hóa
+    corr: np.ndarray
+
+    def at(self, date):
+        i = self.dates.get_loc(date)
+        return self.cov[i], self.corr[i]
+
+
+def rolling_matrices(returns, window):
+    """Ma trận hiệp phương sai (năm hóa) và tương quan cho mọi cửa sổ trượt."""
+    X = returns.to_numpy()
+    n_windows = len(X) - window + 1
+    k = X.shape[1]
+    if n_windows <= 0:
+        empty = np.empty((0, k, k))
+        return RollingMatrices(list(returns.columns), returns.index[:0], empty, empty)
+
+    roller = RollingCovariance(k, window)
+    cov = np.empty((n_windows, k, k))
+    corr = np.empty((n_windows, k, k))
+    for t, x in enumerate(X):
+        roller.push(x)
+        if roller.ready:
+            cov[t - window + 1] = roller.cov() * TRADING_DAYS
+            corr[t - window + 1] = roller.corr()
+    return RollingMatrices(list(returns.columns), returns.index[window - 1:], cov, corr)
+
+
+# ===========================================================
+# 6️⃣ Chỉ tiêu từng mã (Summary / Statistics / Monte Carlo)
+# ===========================================================
+# Các hàm nhận khung giá của một mã (đã sắp xếp theo Date) và trả về số liệu
+# thuần, dùng chung cho dashboard và công cụ tạo báo cáo hàng loạt.
+
+def summary_metrics(df):
+    """Giá đóng cửa mới nhất, trung bình 30 phiên, độ lệch chuẩn lợi nhuận."""
+    close = df["Close"]
+    return {
+        "latest_close": float(close.iloc[-1]),
+        "mean_30d": float(close.tail(30).mean()),
+        "std_return": float(close.pct_change().std()),
+    }
+
+
+class RunningSummary:
+    """summary_metrics cập nhật tăng dần: mỗi giá mới tốn O(1) thay vì tính lại
+    trên toàn bộ lịch sử (trung bình 30 phiên từ hàng đợi cố định, σ lợi nhuận
+    theo thuật toán Welford)."""
+
+    def __init__(self, closes, window=30):
+        closes = np.asarray(closes, dtype=float)
+        closes = closes[~np.isnan(closes)]
+        returns = closes[1:] / closes[:-1] - 1
+        self._tail = deque(closes[-window:], maxlen=window)
+        self._last = closes[-1] if len(closes) else np.nan
+        self._n = len(returns)
+        self._mean = returns.mean() if self._n else 0.0
+        self._m2 = float(((returns - self._mean) ** 2).sum())
+
+    def update(self, close):
+        if np.isnan(close):
+            return
+        if not np.isnan(self._last):
+            r = close / self._last - 1
+            self._n += 1
+            delta = r - self._mean
+            self._mean += delta / self._n
+            self._m2 += delta * (r - self._mean)
+        self._tail.append(close)
+        self._last = close
+
+    def metrics(self):
+        return {
+            "latest_close": float(self._last),
+            "mean_30d": float(np.mean(self._tail)) if self._tail else float("nan"),
+            "std_return": float(np.sqrt(self._m2 / (self._n - 1))) if self._n > 1 else float("nan"),
+        }
+
+
+def daily_returns(df):
+    """Bảng Date + Lợi_nhuận (tỷ suất lợi nhuận ngày), bỏ phiên đầu tiên."""
+    return pd.DataFrame({
+        "Date": df["Date"],
+        "Lợi_nhuận": df["Close"].pct_change(),
+    }).dropna()
+
+
+def return_statistics(returns):
+    """Bảng mô tả thống kê lợi nhuận ngày + skew, kurtosis, Sharpe."""
+    stats_df = returns.describe().to_frame()
+    stats_df.loc["Độ lệch (Skew)"] = returns.skew()
+    stats_df.loc["Độ nhọn (Kurtosis)"] = returns.kurt()
+    stats_df.loc["Chỉ số Sharpe (Lợi nhuận theo rủi ro)"] = returns.mean() / returns.std()
+    return stats_df
+
+
+def monte_carlo_inputs(df):
+    """(giá cuối, độ biến động ngày, lợi nhuận trung bình ngày) cho mô phỏng."""
+    returns = df["Close"].pct_change().dropna()
+    return float(df["Close"].iloc[-1]), float(returns.std()), float(returns.mean())
+
+
+# ===========================================================
+# 7️⃣ Gộp nến tuần / tháng / quý (OHLCV + thống kê lợi nhuận kỳ)
+# ===========================================================
+# Một lượt groupby (Ticker, Kỳ) cho mọi mã tạo nến OHLCV của kỳ, kèm số
+# phiên, tổng và tổng bình phương lợi nhuận ngày trong kỳ — đủ để suy ra
+# trung bình / độ lệch chuẩn / Sharpe theo kỳ mà không cần groupby lại.
+
+RESAMPLE_FREQS = {"W": "Tuần", "M": "Tháng", "Q": "Quý"}
+
+
+def resample_ohlcv(data, freq):
+    """Nến kỳ `freq` ("W", "M", "Q") của mọi mã trong bảng dạng dài.
+
+    `data` sắp xếp theo (Ticker, Date). Kết quả giữ thứ tự đó, cột Date là
+    phiên đầu tiên của kỳ, "Kỳ" là chuỗi ("2024-05", "2024Q2", ...).
+    """
+    key = data["Ticker"]
+    returns = data["Close"].astype(float).groupby(key, sort=False, observed=True).pct_change()
+    frame = pd.DataFrame({
+        "Ticker": key,
+        "Kỳ": data["Date"].dt.to_period(freq),
+        "Date": data["Date"],
+        "Open": data["Open"], "High": data["High"], "Low": data["Low"], "Close": data["Close"],
+        "Volume": data["Volume"].astype(np.int64),          # tổng khối lượng quý có thể vượt uint32
+        "_ret": returns,
+        "_ret2": returns ** 2,
+    })
+    bars = frame.groupby(["Ticker", "Kỳ"], sort=False, observed=True).agg(
+        Date=("Date", "first"), Open=("Open", "first"), High=("High", "max"),
+        Low=("Low", "min"), Close=("Close", "last"), Volume=("Volume", "sum"),
+        n=("_ret", "count"), _ret=("_ret", "sum"), _ret2=("_ret2", "sum"),
+    ).reset_index()
+    bars["Kỳ"] = bars["Kỳ"].astype(str)
+    return bars
+
+
+def period_statistics(bars):
+    """Trung bình, độ lệch chuẩn và Sharpe (%) của lợi nhuận ngày theo kỳ,
+    tính từ các cột tổng của resample_ohlcv (không groupby lại)."""
+    bars = bars[bars["n"] > 0]
+    n = bars["n"]
+    mean = bars["_ret"] / n
+    var = (bars["_ret2"] - bars["_ret"] * mean) / (n - 1)
+    std = np.sqrt(var.clip(lower=0)).where(n > 1)
+    return pd.DataFrame({
+        "Kỳ": bars["Kỳ"].to_numpy(),
+        "mean": mean.to_numpy(),
+        "std": std.to_numpy(),
+        "Sharpe": (mean / std * 100).to_numpy(),
+    })
@@ -0,0 +1,383 @@
+# ===========================================================
+# File: vn30_api.py
+# API HTTP chỉ đọc phục vụ số liệu VN30 đã tính sẵn (JSON / Arrow IPC)
+#
+# Ví dụ:
+#   python vn30_api.py --port 8030              # đọc kho do dashboard / vn30_report.py làm mới
+#   python vn30_api.py --port 8030 --refresh    # API tự tải dữ liệu mới vào kho
+#   curl "http://127.0.0.1:8030/metrics?tickers=FPT,VNM"
+#   curl "http://127.0.0.1:8030/sma?tickers=FPT&start=2024-01-01&format=arrow" -o fpt.arrow
+# ===========================================================
+# Cả tiến trình dùng chung một BackgroundLoader (một panel, làm mới ở nền
+# theo TTL), nên dù nhiều client gọi đồng thời cũng chỉ có một lượt đọc dữ
+# liệu. Mặc định API mở kho Parquet cục bộ ở chế độ chỉ đọc: mỗi TTL chỉ đọc
+# lại kho, việc tải yfinance để cho một tiến trình khác (dashboard hoặc
+# vn30_report.py). Với --refresh, API tự tải phần chênh lệch vào kho.
+#
+# ETag = băm(phiên bản panel + endpoint + tham số đã chuẩn hóa + định dạng),
+# được so với If-None-Match TRƯỚC khi tính, nên client đã có bản mới nhất
+# nhận 304 mà máy chủ không tốn chi phí tính toán. Nội dung đã mã hóa được
+# nhớ trong LRU theo ETag; các yêu cầu giống nhau đến cùng lúc chỉ tính một lần.
+#
+# Endpoint (GET / HEAD; `tickers=FPT,VNM` hoặc bỏ trống = mọi mã):
+#   /health                        phiên bản dữ liệu, số mã, mã tải lỗi
+#   /tickers                       khoảng ngày + số phiên của từng mã
+#   /prices?start=&end=            OHLCV dạng dài
+#   /returns?start=&end=           lợi nhuận ngày
+#   /metrics                       chỉ tiêu tổng quan + Sharpe, biến động, sụt giảm, SMA cuối
+#   /sma?start=&end=               các đường SMA theo ngày
+#   /montecarlo?n_sim=&horizon=    phân vị giá cuối kỳ mô phỏng + xác suất tăng
+# Định dạng: `format=json` (mặc định) hoặc `format=arrow`, hoặc header
+# Accept: application/vnd.apache.arrow.stream.
+
+import argparse
+import hashlib
+import io
+import json
+import logging
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+import pyarrow as pa
+
+from vn30_analytics import (
+    IndicatorEngine, IndicatorParams, monte_carlo_inputs, screen_universe, simulate_percentiles,
+    summary_metrics
+)
+from vn30_data import STORE_DIR, VN30_TICKERS, BackgroundLoader, PriceStore, synthetic_provider
+
+logger = logging.getLogger(__name__)
+
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+JSON_MIME = "application/json; charset=utf-8"
+
+SCREEN_COLUMNS = ["Sharpe", "Vol_năm", "Sụt_giảm_tối_đa", "Lợi_nhuận_kỳ"]
+
+
+class APIError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# ===========================================================
+# 1️⃣ Tham số truy vấn (chuẩn hóa để ETag / cache không phụ thuộc cách viết)
+# ===========================================================
+
+def _parse_tickers(values, available):
+    """["FPT,vnm.VN", "HPG"] -> ["FPT", "HPG", "VNM"]; bỏ trống = mọi mã."""
+    names = {tk.strip().upper().replace(".VN", "") for v in values for tk in v.split(",")} - {""}
+    if not names:
+        return sorted(available)
+    unknown = sorted(names - set(available))
+    if unknown:
+        raise APIError(404, f"Không có dữ liệu cho mã: {', '.join(unknown)}")
+    return sorted(names)
+
+
+def _parse_date(name, value):
+    try:
+        return pd.Timestamp(value).normalize()
+    except ValueError:
+        raise APIError(400, f"{name} không phải ngày hợp lệ: {value!r}") from None
+
+
+def _int_param(low, high):
+    def parse(name, value):
+        try:
+            n = int(value)
+        except ValueError:
+            raise APIError(400, f"{name} phải là số nguyên") from None
+        if not low <= n <= high:
+            raise APIError(400, f"{name} phải trong khoảng [{low}, {high}]")
+        return n
+    return parse
+
+
+PARAM_PARSERS = {
+    "start": _parse_date,
+    "end": _parse_date,
+    "n_sim": _int_param(100, 100_000),
+    "horizon": _int_param(1, 252),
+}
+
+
+# ===========================================================
+# 2️⃣ Số liệu từ panel dùng chung
+# ===========================================================
+
+def _date_range(df, start, end):
+    if start is not None:
+        df = df[df["Date"] >= start]
+    if end is not None:
+        df = df[df["Date"] <= end]
+    return df
+
+
+class AnalyticsService:
+    """Tính số liệu cho từng endpoint từ panel mới nhất của `loader`.
+
+    Chỉ báo (IndicatorEngine) và bảng sàng lọc được ghi nhớ theo phiên bản
+    panel; các bảng kết quả đã mã hóa được nhớ trong LRU tối đa `cache_size` mục.
+    """
+
+    ENDPOINTS = {
+        "/health": {},
+        "/tickers": {},
+        "/prices": {"start": None, "end": None},
+        "/returns": {"start": None, "end": None},
+        "/metrics": {},
+        "/sma": {"start": None, "end": None},
+        "/montecarlo": {"n_sim": 10000, "horizon": 60},
+    }
+
+    def __init__(self, loader, params=IndicatorParams(), cache_size=256, wait_timeout=60):
+        self.loader = loader
+        self.engine = IndicatorEngine(params)
+        self.cache_size = cache_size
+        self.wait_timeout = wait_timeout
+        self.hits = 0
+        self.misses = 0
+        self._screen = (None, None)                 # (phiên bản, bảng screen_universe)
+        self._responses = OrderedDict()             # etag -> (content-type, body)
+        self._inflight = {}                         # etag -> Lock (gộp các yêu cầu trùng)
+        self._lock = threading.Lock()
+
+    def panel(self):
+        panel, failed, fresh = self.loader.latest()
+        if panel is None:
+            # Lượt đầu: chờ bản chụp trong kho (kho rỗng thì chờ lượt tải đầu tiên)
+            self.loader.wait(self.wait_timeout)
+            panel, failed, fresh = self.loader.latest()
+        if panel is None or not panel.tickers:
+            raise APIError(503, "Dữ liệu VN30 đang được tải, thử lại sau")
+        return panel, failed, fresh
+
+    # ---- bảng kết quả của từng endpoint ----
+
+    def health(self, panel, tickers, failed, fresh):
+        return {
+            "version": panel.version,
+            "fresh": fresh,
+            "tickers": len(panel.tickers),
+            "rows": len(panel.data),
+            "failed": [{"ticker": e.ticker, "error": e.error} for e in failed],
+            "cache": {"entries": len(self._responses), "hits": self.hits, "misses": self.misses},
+        }
+
+    def tickers(self, panel, tickers):
+        data = panel.select(tickers)
+        table = data.groupby("Ticker", sort=False, observed=True)["Date"].agg(["min", "max", "count"])
+        table.columns = ["Từ_ngày", "Đến_ngày", "Số_phiên"]
+        return table.reset_index()
+
+    def prices(self, panel, tickers, start, end):
+        return _date_range(panel.select(tickers), start, end)
+
+    def returns(self, panel, tickers, start, end):
+        data = panel.select(tickers)
+        returns = data["Close"].groupby(data["Ticker"], sort=False, observed=True).pct_change()
+        table = data[["Ticker", "Date"]].assign(Lợi_nhuận=returns).dropna(subset=["Lợi_nhuận"])
+        return _date_range(table, start, end)
+
+    def metrics(self, panel, tickers):
+        screen = self._screen_table(panel)
+        sma = [f"SMA_{w}" for w in self.engine.params.sma]
+        rows = []
+        for tk in tickers:
+            last = self.engine.get(tk).iloc[-1]
+            rows.append({
+                "Ticker": tk,
+                "Date": panel.frames[tk]["Date"].iloc[-1],
+                **summary_metrics(panel.frames[tk]),
+                **{c: float(screen.at[tk, c]) for c in SCREEN_COLUMNS},
+                **{c: float(last[c]) for c in sma},
+            })
+        return pd.DataFrame(rows)
+
+    def sma(self, panel, tickers, start, end):
+        columns = ["Ticker", "Date"] + [f"SMA_{w}" for w in self.engine.params.sma]
+        parts = [self.engine.get(tk)[columns] for tk in tickers]
+        return _date_range(pd.concat(parts, ignore_index=True), start, end)
+
+    def montecarlo(self, panel, tickers, n_sim, horizon):
+        rows = []
+        for tk in tickers:
+            last_price, daily_vol, _ = monte_carlo_inputs(panel.frames[tk])
+            bands, final = simulate_percentiles(last_price, daily_vol, n_sim, horizon, seed=42)
+            rows.append({
+                "Ticker": tk, "last_price": last_price, "n_sim": n_sim, "horizon": horizon,
+                **bands.iloc[-1].to_dict(), "prob_up": float((final > last_price).mean()),
+            })
+        return pd.DataFrame(rows)
+
+    def _screen_table(self, panel):
+        version, table = self._screen
+        if version != panel.version:
+            table = screen_universe(panel.data)
+            table.index = table.index.astype(str)
+            self._screen = (panel.version, table)
+        return table
+
+    # ---- điều phối + cache ----
+
+    def handle(self, path, query, accept="", if_none_match=None):
+        """(mã HTTP, header, nội dung) cho một yêu cầu GET."""
+        if path not in self.ENDPOINTS:
+            raise APIError(404, f"Không có endpoint {path}; có: {', '.join(self.ENDPOINTS)}")
+        fmt = (query.get("format") or ["arrow" if ARROW_MIME in accept else "json"])[-1]
+        if fmt not in ("json", "arrow"):
+            raise APIError(400, "format phải là json hoặc arrow")
+
+        panel, failed, fresh = self.panel()
+        tickers = _parse_tickers(query.get("tickers", []), panel.tickers)
+        params = {
+            name: PARAM_PARSERS[name](name, query[name][-1]) if query.get(name) else default
+            for name, default in self.ENDPOINTS[path].items()
+        }
+        if path == "/health":
+            body = json.dumps(self.health(panel, tickers, failed, fresh), ensure_ascii=False)
+            return 200, {"Content-Type": JSON_MIME, "Cache-Control": "no-store"}, body.encode("utf-8")
+
+        key = json.dumps([panel.version, path, tickers, params, fmt], default=str)
+        etag = '"%s"' % hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "X-VN30-Version": panel.version}
+        if _etag_matches(if_none_match, etag):
+            return 304, headers, b""
+
+        with self._lock:
+            gate = self._inflight.setdefault(etag, threading.Lock())
+        with gate:
+            with self._lock:
+                cached = self._responses.get(etag)
+                if cached is not None:
+                    self._responses.move_to_end(etag)
+                    self.hits += 1
+            if cached is None:
+                self.engine.sync(panel)
+                table = getattr(self, path[1:])(panel, tickers, **params)
+                cached = _encode(table, fmt, panel.version)
+                with self._lock:
+                    self.misses += 1
+                    self._responses[etag] = cached
+                    while len(self._responses) > self.cache_size:
+                        self._responses.popitem(last=False)
+            with self._lock:
+                self._inflight.pop(etag, None)
+
+        content_type, body = cached
+        return 200, {**headers, "Content-Type": content_type}, body
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def _encode(table, fmt, version):
+    """(content-type, bytes) của bảng ở dạng JSON hoặc luồng Arrow IPC."""
+    table = table.reset_index(drop=True)
+    if fmt == "arrow":
+        arrow = pa.Table.from_pandas(table, preserve_index=False)
+        arrow = arrow.replace_schema_metadata({**(arrow.schema.metadata or {}), b"vn30_version": version.encode()})
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, arrow.schema) as writer:
+            writer.write_table(arrow)
+        return ARROW_MIME, sink.getvalue()
+    rows = table.to_json(orient="records", date_format="iso", force_ascii=False)
+    body = '{"version": %s, "rows": %s}' % (json.dumps(version), rows)
+    return JSON_MIME, body.encode("utf-8")
+
+
+# ===========================================================
+# 3️⃣ Máy chủ HTTP (mỗi kết nối một luồng, dùng chung AnalyticsService)
+# ===========================================================
+
+class APIHandler(BaseHTTPRequestHandler):
+    server_version = "VN30API/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def _respond(self, send_body):
+        url = urlsplit(self.path)
+        try:
+            status, headers, body = self.server.service.handle(
+                url.path.rstrip("/") or "/health", parse_qs(url.query),
+                accept=self.headers.get("Accept", ""),
+                if_none_match=self.headers.get("If-None-Match"),
+            )
+        except APIError as e:
+            status, headers = e.status, {"Content-Type": JSON_MIME}
+            body = json.dumps({"error": str(e)}, ensure_ascii=False).encode("utf-8")
+        except Exception as e:
+            logger.exception("Lỗi xử lý %s", self.path)
+            status, headers = 500, {"Content-Type": JSON_MIME}
+            body = json.dumps({"error": f"{type(e).__name__}: {e}"}, ensure_ascii=False).encode("utf-8")
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body and status != 304:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+
+def make_server(service, host="127.0.0.1", port=8030):
+    server = ThreadingHTTPServer((host, port), APIHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API chỉ đọc phục vụ số liệu VN30 (JSON / Arrow)")
+    parser.add_argument("--host", default="127.0.0.1", help="Địa chỉ lắng nghe")
+    parser.add_argument("--port", type=int, default=8030, help="Cổng lắng nghe")
+    parser.add_argument("--period", default="1y", help="Khoảng dữ liệu (kiểu yfinance)")
+    parser.add_argument("--ttl", type=int, default=300, help="Số giây trước khi đọc / tải lại dữ liệu mới")
+    parser.add_argument("--store", default=STORE_DIR, help="Thư mục kho Parquet cục bộ")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Tự tải dữ liệu mới vào kho (mặc định chỉ đọc kho do tiến trình khác làm mới)")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="Dùng dữ liệu giả lập (không cần mạng), kho riêng <store>_synthetic")
+    parser.add_argument("--cache-size", type=int, default=256, help="Số kết quả giữ trong cache")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    fetch_kwargs = {}
+    store = PriceStore(args.store, read_only=not args.refresh)
+    if args.synthetic:
+        fetch_kwargs["provider"] = synthetic_provider()
+        # Không ghi dữ liệu giả vào kho thật; kho giả lập do chính API làm mới
+        store = PriceStore(args.store.rstrip("/") + "_synthetic")
+    loader = BackgroundLoader(store, VN30_TICKERS, period=args.period, ttl=args.ttl, **fetch_kwargs)
+    loader.start()
+
+    server = make_server(AnalyticsService(loader, cache_size=args.cache_size), args.host, args.port)
+    logger.info("VN30 API tại http://%s:%d", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,160 @@
+# ===========================================================
+# File: vn30_backtest.py
+# Kiểm định chiến lược giao cắt SMA cho mọi mã và mọi cặp (nhanh, chậm)
+# ===========================================================
+# Toàn bộ lưới tham số được tính cùng lúc bằng mảng NumPy 3 chiều
+# (tổ hợp × phiên × mã), không lặp theo từng phiên. Lưới lớn được chia khối
+# theo `max_cells` để bộ nhớ không tăng theo số tổ hợp, và có thể chạy các
+# khối song song trên nhiều tiến trình.
+#
+# Giả định giao dịch:
+#   - Tín hiệu tính ở giá đóng cửa phiên t, khớp lệnh ngay tại giá đó, vị thế
+#     hưởng lợi nhuận từ phiên t+1.
+#   - Phí môi giới `fee` mỗi chiều, thêm thuế bán `sell_tax` (0,1% ở VN).
+#   - Thanh toán T+2.5: mua ở phiên t thì cổ phiếu về chiều phiên t+2, nên
+#     sớm nhất bán được ở phiên t+2 (giữ tối thiểu `settlement` phiên).
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from vn30_analytics import TRADING_DAYS
+
+STAT_COLUMNS = ["Lợi_nhuận", "CAGR", "Sharpe", "Sụt_giảm_tối_đa", "Số_lệnh", "Thời_gian_nắm_giữ"]
+
+# ===========================================================
+# 1️⃣ Lưới tham số + đường trung bình
+# ===========================================================
+
+def sma_grid(fast_windows, slow_windows):
+    """Các cặp (nhanh, chậm) hợp lệ (nhanh < chậm) của lưới tham số."""
+    return [(f, s) for f in fast_windows for s in slow_windows if f < s]
+
+
+def _rolling_means(values, windows):
+    """SMA của mọi cửa sổ trên bảng (phiên × mã) bằng tổng tích lũy.
+
+    Trả về mảng (cửa sổ × phiên × mã); NaN khi cửa sổ chưa đủ phiên có giá.
+    """
+    n_days, n_tickers = values.shape
+    valid = ~np.isnan(values)
+    zeros = np.zeros((1, n_tickers))
+    csum = np.vstack([zeros, np.cumsum(np.where(valid, values, 0.0), axis=0)])
+    count = np.vstack([zeros, np.cumsum(valid, axis=0)])
+    out = np.full((len(windows), n_days, n_tickers), np.nan)
+    for i, w in enumerate(windows):
+        if w > n_days:
+            continue
+        total = csum[w:] - csum[:-w]
+        full = (count[w:] - count[:-w]) == w
+        out[i, w - 1:] = np.where(full, total / w, np.nan)
+    return out
+
+
+# ===========================================================
+# 2️⃣ Chạy một khối tổ hợp (mảng tổ hợp × phiên × mã)
+# ===========================================================
+
+def _run_chunk(values, combos, fee, sell_tax, settlement):
+    """(equity float32, bảng chỉ tiêu) cho một khối tổ hợp."""
+    fast = [f for f, _ in combos]
+    slow = [s for _, s in combos]
+    windows = sorted(set(fast) | set(slow))
+    index = {w: i for i, w in enumerate(windows)}
+    sma = _rolling_means(values, windows)
+    signal = sma[[index[f] for f in fast]] > sma[[index[s] for s in slow]]   # NaN => False
+
+    # T+2.5: trong `settlement` phiên kể từ lần mua gần nhất thì buộc giữ vị thế
+    n_days = values.shape[0]
+    t = np.arange(n_days)[None, :, None]
+    prev = np.zeros_like(signal)
+    prev[:, 1:] = signal[:, :-1]
+    last_entry = np.maximum.accumulate(np.where(signal & ~prev, t, -n_days), axis=1)
+    held = signal | (t - last_entry < settlement)
+
+    returns = np.zeros_like(values)
+    returns[1:] = values[1:] / values[:-1] - 1
+    returns = np.nan_to_num(returns)
+
+    position = held.astype(np.int8)
+    trade = np.diff(position, axis=1, prepend=0)
+    cost = fee * np.abs(trade) + sell_tax * (trade < 0)
+    strat = np.zeros(held.shape)
+    strat[:, 1:] = position[:, :-1] * returns[1:]
+    strat -= cost
+
+    equity = np.cumprod(1 + strat, axis=1)
+    years = max(n_days - 1, 1) / TRADING_DAYS
+    std = strat.std(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        stats = np.stack([
+            equity[:, -1] - 1,
+            equity[:, -1] ** (1 / years) - 1,
+            np.where(std > 0, strat.mean(axis=1) / std * np.sqrt(TRADING_DAYS), np.nan),
+            (equity / np.maximum.accumulate(equity, axis=1) - 1).min(axis=1),
+            (trade > 0).sum(axis=1),
+            held.mean(axis=1),
+        ], axis=-1)                                   # (tổ hợp × mã × chỉ tiêu)
+    return equity.astype(np.float32), stats
+
+
+# ===========================================================
+# 3️⃣ Kiểm định cả lưới (chia khối + tùy chọn đa tiến trình)
+# ===========================================================
+
+@dataclass
+class BacktestResult:
+    dates: pd.DatetimeIndex
+    tickers: list
+    combos: list            # [(nhanh, chậm), ...] theo thứ tự trục 0 của equity
+    equity: np.ndarray      # (tổ hợp × phiên × mã), giá trị tài sản bắt đầu từ 1
+    stats: pd.DataFrame     # mỗi dòng một (nhanh, chậm, mã)
+    buy_hold: pd.Series     # lợi nhuận mua & giữ của từng mã (để so sánh)
+
+    def curve(self, fast, slow, ticker):
+        """Đường tài sản của một tổ hợp trên một mã."""
+        i = self.combos.index((fast, slow))
+        return pd.Series(self.equity[i, :, self.tickers.index(ticker)], index=self.dates, name=ticker)
+
+    def best(self, by="Sharpe"):
+        """Tổ hợp tốt nhất của từng mã theo chỉ tiêu `by`."""
+        stats = self.stats.dropna(subset=[by])
+        best = stats.loc[stats.groupby("Ticker", sort=False)[by].idxmax()]
+        return best.assign(Mua_giữ=best["Ticker"].map(self.buy_hold)).reset_index(drop=True)
+
+
+def backtest_sma_grid(close, combos, fee=0.0015, sell_tax=0.001, settlement=2,
+                      max_cells=1_000_000, workers=None):
+    """Kiểm định giao cắt SMA cho mọi mã (cột của `close`) × mọi tổ hợp.
+
+    `close`: bảng rộng Date × Ticker giá đóng cửa. Các tổ hợp được chia khối
+    sao cho mỗi khối có tối đa `max_cells` phần tử (tổ hợp × phiên × mã);
+    `workers` > 1 thì các khối chạy song song trên nhiều tiến trình.
+    """
+    values = close.to_numpy(dtype=float)
+    n_days, n_tickers = values.shape
+    per_chunk = max(1, max_cells // max(n_days * n_tickers, 1))
+    chunks = [combos[i:i + per_chunk] for i in range(0, len(combos), per_chunk)]
+    args = (fee, sell_tax, settlement)
+
+    if workers and workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_run_chunk, values, chunk, *args) for chunk in chunks]
+            parts = [fut.result() for fut in futures]
+    else:
+        parts = [_run_chunk(values, chunk, *args) for chunk in chunks]
+
+    equity = np.concatenate([p[0] for p in parts])
+    stats = np.concatenate([p[1] for p in parts])
+    tickers = [str(tk) for tk in close.columns]
+    table = pd.DataFrame(stats.reshape(-1, len(STAT_COLUMNS)), columns=STAT_COLUMNS)
+    table.insert(0, "Ticker", np.tile(tickers, len(combos)))
+    table.insert(0, "Chậm", np.repeat([s for _, s in combos], n_tickers))
+    table.insert(0, "Nhanh", np.repeat([f for f, _ in combos], n_tickers))
+    table["Số_lệnh"] = table["Số_lệnh"].astype(int)
+
+    buy_hold = close.ffill().iloc[-1] / close.bfill().iloc[0] - 1
+    buy_hold.index = tickers
+    return BacktestResult(close.index, tickers, list(combos), equity, table, buy_hold)
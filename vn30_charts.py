@@ -0,0 +1,287 @@
+# ===========================================================
+# File: vn30_charts.py
+# Tiện ích dựng biểu đồ Plotly cho dashboard
+# ===========================================================
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# plotly chỉ được import trong các hàm dựng biểu đồ để khởi động nhanh hơn
+
+# ===========================================================
+# 1️⃣ Chọn chế độ vẽ SVG / WebGL
+# ===========================================================
+# Trace SVG vẽ từng điểm thành phần tử DOM nên chậm khi nhiều mã × nhiều năm;
+# trên ngưỡng này chuyển sang WebGL (Scattergl).
+
+WEBGL_POINT_THRESHOLD = 5000
+
+
+def use_webgl(n_points, threshold=WEBGL_POINT_THRESHOLD):
+    return n_points > threshold
+
+
+def line_render_mode(n_points, threshold=WEBGL_POINT_THRESHOLD):
+    """Giá trị `render_mode` cho px.line theo tổng số điểm của biểu đồ."""
+    return "webgl" if use_webgl(n_points, threshold) else "svg"
+
+
+# ===========================================================
+# 2️⃣ Giảm mẫu LTTB (Largest-Triangle-Three-Buckets)
+# ===========================================================
+# Chỉ gửi tối đa khoảng `budget` điểm mỗi đường tới trình duyệt. LTTB giữ
+# hình dạng đường giá; điểm cao nhất / thấp nhất luôn được giữ lại.
+# Dữ liệu ngắn hơn ngân sách được trả về nguyên vẹn.
+
+DEFAULT_CHART_WIDTH = 1200          # px, ~1 điểm mỗi pixel ngang
+
+
+def point_budget(width_px=DEFAULT_CHART_WIDTH, points_per_px=1.0):
+    return max(3, int(width_px * points_per_px))
+
+
+def lttb_indices(x, y, n_out):
+    """Vị trí các điểm được chọn (tăng dần) khi giảm (x, y) xuống ~n_out điểm."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # n_out - 2 nhóm ở giữa; điểm đầu và điểm cuối luôn giữ
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    idx = np.empty(n_out, dtype=int)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[hi:nxt_hi].mean()
+        avg_y = y[hi:nxt_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        idx[i + 1] = a
+
+    extremes = [int(np.nanargmin(y)), int(np.nanargmax(y))]
+    return np.unique(np.concatenate([idx, extremes]))
+
+
+def downsample(df, budget, x="Date", y="Close"):
+    """Giữ các dòng của `df` được LTTB chọn theo cột `y` (mọi cột khác đi kèm)."""
+    if len(df) <= budget:
+        return df
+    xs = df[x].to_numpy()
+    if np.issubdtype(xs.dtype, np.datetime64):
+        xs = xs.astype("datetime64[ns]").astype("int64")
+    return df.iloc[lttb_indices(xs, df[y].to_numpy(), budget)]
+
+
+# ===========================================================
+# 3️⃣ Các biểu đồ dùng chung (dashboard + báo cáo hàng loạt)
+# ===========================================================
+
+def price_area_figure(df, ticker):
+    """Biểu đồ vùng giá đóng cửa kèm bộ chọn khoảng thời gian (tab Summary)."""
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=df["Date"],
+        y=df["Close"],
+        mode="lines",
+        name="Giá đóng cửa",
+        line=dict(color="#0077b6", width=2),
+        fill="tozeroy",
+        fillcolor="rgba(0, 119, 182, 0.25)"
+    ))
+
+    # Bộ chọn thời gian
+    fig.update_xaxes(
+        rangeselector=dict(
+            buttons=list([
+                dict(count=1, label="1M", step="month", stepmode="backward"),
+                dict(count=3, label="3M", step="month", stepmode="backward"),
+                dict(count=6, label="6M", step="month", stepmode="backward"),
+                dict(count=1, label="1Y", step="year", stepmode="backward"),
+                dict(step="all", label="MAX")
+            ])
+        ),
+        rangeslider=dict(visible=False),
+        type="date"
+    )
+
+    # Tùy chỉnh giao diện
+    fig.update_layout(
+        title=f"Biểu đồ biến động giá cổ phiếu {ticker}",
+        xaxis_title="Thời gian",
+        yaxis_title="Giá đóng cửa (VND)",
+        template="plotly_white",
+        hovermode="x unified",
+        plot_bgcolor="rgba(0,0,0,0)",
+        paper_bgcolor="rgba(0,0,0,0)",
+        margin=dict(l=20, r=20, t=60, b=30)
+    )
+    return fig
+
+
+def returns_box_figure(df_returns, ticker):
+    import plotly.express as px
+
+    fig = px.box(
+        df_returns, y="Lợi_nhuận",
+        color_discrete_sequence=["#ff6361"],
+        title=f"Boxplot lợi nhuận cổ phiếu {ticker}",
+        labels={"Lợi_nhuận": "Tỷ suất lợi nhuận hàng ngày"}
+    )
+    fig.update_layout(template="plotly_white")
+    return fig
+
+
+def returns_histogram_figure(df_returns, ticker):
+    import plotly.express as px
+
+    fig = px.histogram(
+        df_returns, x="Lợi_nhuận", nbins=40,
+        color_discrete_sequence=["#1a73e8"],
+        title=f"Phân phối lợi nhuận cổ phiếu {ticker}",
+        labels={"Lợi_nhuận": "Tỷ suất lợi nhuận hàng ngày", "count": "Số ngày"}
+    )
+    fig.update_layout(template="plotly_white")
+    return fig
+
+
+def montecarlo_fan_figure(bands, ticker, n_sim):
+    """Biểu đồ quạt: dải 5–95% và 25–75% quanh đường trung vị."""
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    for low, high, color, name in [
+        ("P5", "P95", "rgba(0, 119, 182, 0.15)", "Khoảng 5% – 95%"),
+        ("P25", "P75", "rgba(0, 119, 182, 0.35)", "Khoảng 25% – 75%"),
+    ]:
+        fig.add_trace(go.Scatter(
+            x=bands.index, y=bands[high], mode="lines",
+            line=dict(width=0), showlegend=False, hoverinfo="skip"
+        ))
+        fig.add_trace(go.Scatter(
+            x=bands.index, y=bands[low], mode="lines", name=name,
+            line=dict(width=0), fill="tonexty", fillcolor=color
+        ))
+    fig.add_trace(go.Scatter(
+        x=bands.index, y=bands["P50"], mode="lines", name="Trung vị",
+        line=dict(color="#0077b6", width=2)
+    ))
+    fig.update_layout(
+        title=f"Dải phân vị giá mô phỏng {ticker} ({n_sim:,} lần)",
+        xaxis_title="Số ngày", yaxis_title="Giá (VND)",
+        template="plotly_white", hovermode="x unified"
+    )
+    return fig
+
+
+def loss_distribution_figure(losses, var_lines, horizon, bins=120):
+    """Histogram phân phối lỗ danh mục (đếm sẵn bằng NumPy, chỉ gửi `bins` cột)
+    kèm các đường VaR / CVaR; `var_lines` là {nhãn: mức lỗ}."""
+    import plotly.graph_objects as go
+
+    counts, edges = np.histogram(losses, bins=bins)
+    centers = (edges[:-1] + edges[1:]) / 2
+    fig = go.Figure(go.Bar(
+        x=centers * 100, y=counts / len(losses), width=np.diff(edges) * 100,
+        marker_color="#90be6d", name="Tần suất",
+        hovertemplate="Lỗ %{x:.2f}%: %{y:.2%}<extra></extra>"
+    ))
+    for i, (label, value) in enumerate(var_lines.items()):
+        fig.add_vline(x=value * 100, line_dash="dash" if label.startswith("VaR") else "dot",
+                      line_color="#d62828", annotation_text=label,
+                      annotation_position="top" if i % 2 == 0 else "bottom")
+    fig.update_layout(
+        title=f"Phân phối lỗ danh mục sau {horizon} phiên ({len(losses):,} đường)",
+        xaxis_title="Lỗ (% giá trị danh mục, âm = lãi)", yaxis_title="Tần suất",
+        template="plotly_white", bargap=0
+    )
+    return fig
+
+
+# ===========================================================
+# 4️⃣ Bộ nhớ đệm biểu đồ đã dựng (LRU theo dung lượng)
+# ===========================================================
+# Lưu chính đối tượng go.Figure theo khóa (tab, mã/danh mục, tham số, phiên
+# bản dữ liệu), không tuần tự hóa: khi cache miss, biểu đồ vừa dựng được đưa
+# thẳng cho st.plotly_chart (chỉ Streamlit tuần tự hóa một lần); khi hit,
+# st.plotly_chart nhận go.Figure nên bỏ qua bước kiểm tra lại đặc tả mà một
+# dict phải qua. Dung lượng mỗi mục ước lượng từ các mảng dữ liệu của biểu
+# đồ; khi tổng vượt `max_bytes` thì bỏ các biểu đồ lâu không dùng nhất.
+# Biểu đồ trong cache dùng chung giữa các phiên nên chỉ được đọc, không sửa.
+
+def figure_nbytes(fig):
+    """Ước lượng bộ nhớ của biểu đồ (mảng dữ liệu + thuộc tính), không tuần tự hóa."""
+    def size(value):
+        if isinstance(value, np.ndarray):
+            return value.nbytes if value.dtype.kind != "O" else 64 * value.size
+        if isinstance(value, dict):
+            return sum(len(k) + size(v) for k, v in value.items())
+        if isinstance(value, (list, tuple)):
+            return 8 * len(value) + sum(size(v) for v in value)
+        if isinstance(value, (str, bytes)):
+            return len(value)
+        return 16
+    return size(fig.to_plotly_json())
+
+
+class FigureCache:
+    def __init__(self, max_bytes=64 * 2 ** 20, max_entry_bytes=None):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes or max_bytes // 4
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()          # khóa -> (go.Figure, số byte), cuối = dùng gần nhất
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Biểu đồ nếu có trong cache, ngược lại None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, fig):
+        """Lưu biểu đồ (bỏ qua nếu một mình nó đã vượt `max_entry_bytes`)."""
+        nbytes = figure_nbytes(fig)
+        if nbytes > self.max_entry_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            self._entries[key] = (fig, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+                self.evictions += 1
+
+    def get_or_build(self, key, build):
+        """(biểu đồ, hit): lấy từ cache, hoặc dựng bằng `build()` rồi lưu lại."""
+        fig = self.get(key)
+        if fig is not None:
+            return fig, True
+        fig = build()
+        self.put(key, fig)
+        return fig, False
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
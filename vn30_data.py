@@ -0,0 +1,534 @@
+# ===========================================================
+# File: vn30_data.py
+# Tải dữ liệu VN30 song song (không phụ thuộc Streamlit)
+# ===========================================================
+
+import logging
+import os
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+VN30_TICKERS = [
+    "FPT.VN", "HPG.VN", "MWG.VN", "VNM.VN", "VCB.VN", "SSI.VN",
+    "TCB.VN", "MBB.VN", "CTG.VN", "GAS.VN", "VHM.VN", "BVH.VN",
+    "VIC.VN", "PLX.VN", "STB.VN", "SAB.VN", "NVL.VN", "VPB.VN"
+]
+
+OHLCV_COLUMNS = ["Date", "Open", "High", "Low", "Close", "Volume", "Ticker"]
+
+NO_DATA = "không có dữ liệu"
+
+
+# ===========================================================
+# 1️⃣ Kiểu dữ liệu kết quả
+# ===========================================================
+
+@dataclass
+class FetchError:
+    """Một mã tải thất bại sau khi đã thử lại."""
+    ticker: str
+    attempts: int
+    error: str
+
+
+@dataclass
+class LoadResult:
+    """Kết quả tải: bảng dạng dài + danh sách mã lỗi + thời gian (giây)."""
+    data: pd.DataFrame
+    failed: list
+    elapsed: float
+
+
+# ===========================================================
+# 2️⃣ Nguồn dữ liệu (provider)
+# ===========================================================
+# Provider là hàm provider(symbols, period, timeout, start=None) -> DataFrame
+# theo định dạng của yf.download (nhiều mã => cột MultiIndex (mã, trường)).
+# Khi có `start` thì chỉ lấy các phiên từ ngày đó trở đi (tải phần chênh lệch).
+# Có thể thay bằng nguồn giả lập để đo thời gian khởi động khi không có mạng.
+
+def yfinance_provider(symbols, period="1y", timeout=10, start=None):
+    import yfinance as yf
+
+    window = {"start": start} if start is not None else {"period": period}
+    return yf.download(
+        symbols, group_by="ticker", threads=True,
+        progress=False, timeout=timeout, **window
+    )
+
+
+def _normalize(df, symbol):
+    """Chuẩn hóa khung giá một mã về dạng dài (Date, OHLCV, Ticker)."""
+    if df is None or df.empty:
+        return None
+    df = df.dropna(how="all")
+    if df.empty:
+        return None
+    df = df.reset_index()
+    df.columns.name = None
+    df = df.rename(columns={"index": "Date", "Datetime": "Date"})
+    df["Ticker"] = symbol.replace(".VN", "")
+    return df[[c for c in OHLCV_COLUMNS if c in df.columns]]
+
+
+def _split_batch(raw, symbols):
+    """Tách kết quả yf.download nhiều mã thành từng khung theo mã."""
+    frames = {}
+    if raw is None or raw.empty:
+        return frames
+    if not isinstance(raw.columns, pd.MultiIndex):
+        # Chỉ có một mã => cột phẳng
+        if len(symbols) == 1:
+            frames[symbols[0]] = _normalize(raw, symbols[0])
+        return {k: v for k, v in frames.items() if v is not None}
+    level0 = set(raw.columns.get_level_values(0))
+    for sym in symbols:
+        if sym in level0:
+            df = _normalize(raw[sym], sym)
+        else:
+            # group_by="column": (trường, mã)
+            try:
+                df = _normalize(raw.xs(sym, axis=1, level=1), sym)
+            except KeyError:
+                df = None
+        if df is not None:
+            frames[sym] = df
+    return frames
+
+
+def synthetic_ohlcv(symbols, n_days=252, end=None, start=None, seed=0):
+    """Giá OHLCV giả lập (bước ngẫu nhiên log-normal), cùng định dạng yf.download.
+
+    Mỗi mã có hạt giống riêng (seed + crc32 của mã) nên kết quả không phụ thuộc
+    thứ tự hay số lượng mã được yêu cầu. Có `start` thì chỉ trả các phiên từ
+    ngày đó trở đi trong cùng một chuỗi giá.
+    """
+    end = pd.Timestamp(end or pd.Timestamp.today()).normalize()
+    dates = pd.bdate_range(end=end, periods=n_days, name="Date")
+    fields = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+    blocks = {}
+    for sym in symbols:
+        rng = np.random.default_rng(seed + zlib.crc32(sym.encode()))
+        base = rng.uniform(10_000, 150_000)
+        close = base * np.exp(np.cumsum(rng.normal(0.0003, 0.018, n_days)))
+        open_ = close * np.exp(rng.normal(0, 0.006, n_days))
+        high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.008, n_days)))
+        low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.008, n_days)))
+        volume = rng.lognormal(13.5, 0.6, n_days).astype(np.int64)
+        for field, values in zip(fields, [open_, high, low, close, close, volume]):
+            blocks[(sym, field)] = values
+    raw = pd.DataFrame(blocks, index=dates)
+    raw.columns = pd.MultiIndex.from_tuples(raw.columns, names=["Ticker", "Price"])
+    if start is not None:
+        raw = raw.loc[pd.Timestamp(start):]
+    return raw
+
+
+def synthetic_provider(n_days=252, end=None, seed=0):
+    """Provider giả lập (không cần mạng) để đo thời gian tải / chạy offline."""
+    def provider(symbols, period="1y", timeout=10, start=None):
+        return synthetic_ohlcv(symbols, n_days=n_days, end=end, start=start, seed=seed)
+    return provider
+
+
+# ===========================================================
+# 3️⃣ Tải song song + thử lại từng mã
+# ===========================================================
+
+def _fetch_with_retry(provider, symbol, period, start, timeout, retries, backoff):
+    last_error = NO_DATA
+    for attempt in range(1, retries + 1):
+        try:
+            frames = _split_batch(provider([symbol], period, timeout, start), [symbol])
+            if symbol in frames:
+                return frames[symbol], None
+        except Exception as e:  # lỗi mạng / lỗi nguồn dữ liệu
+            last_error = f"{type(e).__name__}: {e}"
+        if attempt < retries:
+            time.sleep(backoff * 2 ** (attempt - 1))
+    return None, FetchError(symbol.replace(".VN", ""), retries, last_error)
+
+
+def fetch_vn30(tickers=None, period="1y", provider=None, start=None, batch=True,
+               max_workers=8, timeout=10, retries=3, backoff=0.5):
+    """Tải giá nhiều mã: một lệnh gộp, sau đó thử lại song song các mã thiếu.
+
+    Trả về LoadResult với bảng dạng dài giữ đúng thứ tự `tickers`.
+    """
+    tickers = list(tickers or VN30_TICKERS)
+    provider = provider or yfinance_provider
+    t0 = time.perf_counter()
+
+    frames = {}
+    if batch:
+        try:
+            frames = _split_batch(provider(tickers, period, timeout, start), tickers)
+        except Exception as e:
+            logger.warning("Tải gộp VN30 thất bại, chuyển sang tải từng mã: %s", e)
+
+    missing = [tk for tk in tickers if tk not in frames]
+    failed = []
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as pool:
+            results = pool.map(
+                lambda tk: _fetch_with_retry(provider, tk, period, start, timeout, retries, backoff),
+                missing
+            )
+            for tk, (df, err) in zip(missing, results):
+                if df is not None:
+                    frames[tk] = df
+                else:
+                    failed.append(err)
+                    # Không có phiên mới (cuối tuần, ngày lễ) là bình thường khi tải phần chênh lệch
+                    log = logger.debug if err.error == NO_DATA else logger.warning
+                    log("Lỗi tải %s sau %d lần: %s", tk, err.attempts, err.error)
+
+    data_list = [frames[tk] for tk in tickers if tk in frames]
+    data = pd.concat(data_list) if data_list else pd.DataFrame()
+    return LoadResult(data=data, failed=failed, elapsed=time.perf_counter() - t0)
+
+
+# ===========================================================
+# 4️⃣ Bảng giá đã sắp xếp theo từng mã (panel)
+# ===========================================================
+# Sắp xếp một lần theo (Ticker, Date) khi tải; mỗi mã là một lát cắt liên tục
+# của bảng chung nên lấy dữ liệu một mã là O(1) và không sao chép.
+# Các tab chỉ đọc, không gán cột mới vào các khung này.
+#
+# Kiểu dữ liệu gọn: Ticker là category (1 byte/dòng), giá OHLC float32
+# (đủ 7 chữ số có nghĩa, dư cho giá VND), Volume là số nguyên không dấu nhỏ
+# nhất đủ chứa, Date là một cột datetime64. Mỗi dòng 29 byte + 4 byte trong
+# bảng rộng `close` => khoảng 8,3 KB cho một mã trong một năm (252 phiên),
+# so với ~17 KB khi để Ticker kiểu chuỗi và OHLCV 64 bit.
+
+PRICE_COLUMNS = ["Open", "High", "Low", "Close"]
+PANEL_BYTES_PER_TICKER_YEAR = 10 * 1024     # ngân sách bộ nhớ (kiểm tra trong bench_vn30.py)
+
+
+def compact_prices(data):
+    """Đổi bảng dạng dài sang kiểu dữ liệu gọn (xem chú thích ở trên)."""
+    volume = data["Volume"].fillna(0).to_numpy()
+    volume_dtype = np.uint32 if len(volume) == 0 or volume.max() < 2 ** 32 else np.uint64
+    return data.astype({
+        **{c: np.float32 for c in PRICE_COLUMNS if c in data.columns},
+        "Ticker": pd.CategoricalDtype(sorted(data["Ticker"].unique())),
+    }).assign(
+        Date=pd.to_datetime(data["Date"]),
+        Volume=volume.astype(volume_dtype),
+    )
+
+
+@dataclass
+class PricePanel:
+    data: pd.DataFrame      # bảng dạng dài, sắp xếp theo (Ticker, Date)
+    frames: dict            # Ticker -> lát cắt của `data`
+    close: pd.DataFrame     # bảng rộng Date × Ticker của giá đóng cửa
+    version: str            # đổi khi dữ liệu đổi (dùng làm khóa cache)
+
+    @property
+    def tickers(self):
+        return list(self.frames)
+
+    @property
+    def nbytes(self):
+        """Bộ nhớ của bảng dạng dài + bảng rộng (các lát cắt `frames` không tốn thêm)."""
+        return int(self.data.memory_usage(index=True, deep=True).sum()
+                   + self.close.memory_usage(index=True, deep=True).sum())
+
+    def get(self, ticker):
+        return self.frames.get(ticker, self.data.iloc[0:0])
+
+    def select(self, tickers):
+        """Bảng dạng dài của nhiều mã (vẫn sắp xếp theo Ticker, Date)."""
+        parts = [self.frames[tk] for tk in sorted(tickers) if tk in self.frames]
+        return pd.concat(parts, ignore_index=True) if parts else self.data.iloc[0:0]
+
+
+def build_panel(data):
+    if data.empty:
+        return PricePanel(data=data, frames={}, close=pd.DataFrame(), version="empty")
+
+    data = compact_prices(data).sort_values(["Ticker", "Date"], kind="stable").reset_index(drop=True)
+    codes = data["Ticker"].cat.codes.to_numpy()
+    present, starts = np.unique(codes, return_index=True)
+    stops = list(starts[1:]) + [len(data)]
+    names = data["Ticker"].cat.categories[present]
+    frames = {tk: data.iloc[a:b] for tk, a, b in zip(names, starts, stops)}
+
+    close = data.pivot(index="Date", columns="Ticker", values="Close")
+    close.columns = pd.Index(close.columns.astype(str), name="Ticker")
+    # Dấu vân tay phiên cuối mỗi mã: thay nến cuối tại chỗ (cùng ngày, cùng số dòng) vẫn đổi version
+    last = data.iloc[np.asarray(stops) - 1]
+    digest = int(pd.util.hash_pandas_object(last, index=False).sum())
+    version = f"{data['Date'].max():%Y%m%d}-{len(data)}-{len(frames)}-{digest:016x}"
+    return PricePanel(data=data, frames=frames, close=close, version=version)
+
+
+# ===========================================================
+# 5️⃣ Kho giá cục bộ (Parquet, mỗi mã một file)
+# ===========================================================
+# Cấu trúc thư mục: <root>/<TICKER>.parquet, mỗi file chứa Date + OHLCV.
+# Khi làm mới chỉ tải lại từ phiên cuối cùng đã lưu (phiên đó có thể là nến
+# chưa đóng cửa) rồi ghép thêm, nên khởi động lại hoặc hết TTL chỉ tốn một
+# lần tải phần chênh lệch.
+#
+# Nhiều tiến trình (dashboard, vn30_report.py...) có thể ghi cùng một kho:
+# mỗi lần ghi giữ khóa file <TICKER>.parquet.lock trong suốt đọc – ghép – thay
+# file, và ghi ra file tạm có tên riêng trong cùng thư mục rồi mới đổi tên.
+
+STORE_DIR = os.environ.get("VN30_STORE_DIR", "data_cache/vn30")
+
+_PERIOD_UNITS = {"d": "days", "wk": "weeks", "mo": "months", "y": "years"}
+
+
+def period_start(period, today=None):
+    """Đổi chuỗi period kiểu yfinance ("1y", "6mo", "max") thành ngày bắt đầu."""
+    today = pd.Timestamp(today or pd.Timestamp.today()).normalize()
+    for unit, name in _PERIOD_UNITS.items():
+        if period.endswith(unit) and period[:-len(unit)].isdigit():
+            return today - pd.DateOffset(**{name: int(period[:-len(unit)])})
+    return None  # "max", "ytd"... => đọc toàn bộ kho
+
+
+@contextmanager
+def _file_lock(path):
+    """Khóa độc quyền giữa các tiến trình / luồng trên file `path`.lock."""
+    with open(path + ".lock", "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+
+            while True:
+                try:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:     # LK_LOCK chỉ thử lại 10 giây rồi báo lỗi
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class PriceStore:
+    """Kho Parquet cục bộ; `read_only=True` thì refresh() chỉ đọc lại kho (do
+    một tiến trình khác làm mới), không tải và không ghi gì."""
+
+    def __init__(self, root=STORE_DIR, read_only=False):
+        self.root = root
+        self.read_only = read_only
+
+    def path(self, ticker):
+        return os.path.join(self.root, f"{ticker.replace('.VN', '')}.parquet")
+
+    def tickers(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(f[:-len(".parquet")] for f in os.listdir(self.root) if f.endswith(".parquet"))
+
+    def last_date(self, ticker):
+        """Ngày cuối cùng đã lưu của một mã (None nếu chưa có)."""
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        path = self.path(ticker)
+        if not os.path.exists(path):
+            return None
+        dates = pq.read_table(path, columns=["Date"], memory_map=True)["Date"]
+        if len(dates) == 0:
+            return None
+        return pd.Timestamp(pc.max(dates).as_py())
+
+    def _read_one(self, ticker, start=None):
+        import pyarrow.parquet as pq
+
+        filters = [("Date", ">=", pd.Timestamp(start))] if start is not None else None
+        df = pq.read_table(self.path(ticker), memory_map=True, filters=filters).to_pandas()
+        df["Ticker"] = ticker.replace(".VN", "")
+        return df
+
+    def read(self, tickers=None, start=None):
+        """Đọc kho về bảng dạng dài (cùng định dạng với fetch_vn30)."""
+        tickers = [tk.replace(".VN", "") for tk in (tickers or self.tickers())]
+        data_list = [self._read_one(tk, start) for tk in tickers if os.path.exists(self.path(tk))]
+        data_list = [df for df in data_list if not df.empty]
+        return pd.concat(data_list) if data_list else pd.DataFrame()
+
+    def append(self, data):
+        """Ghép các phiên mới vào file của từng mã (bỏ trùng theo Date)."""
+        if self.read_only:
+            raise PermissionError(f"Kho {self.root} đang mở ở chế độ chỉ đọc")
+        if data.empty:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        for tk, df_new in data.groupby("Ticker", sort=False):
+            df_new = df_new.drop(columns="Ticker")
+            path = self.path(tk)
+            with _file_lock(path):
+                if os.path.exists(path):
+                    df_old = self._read_one(tk).drop(columns="Ticker")
+                    df_new = pd.concat([df_old, df_new])
+                df_new = (
+                    df_new.drop_duplicates("Date", keep="last")
+                    .sort_values("Date")
+                    .reset_index(drop=True)
+                )
+                # Ghi ra file tạm (tên riêng cho mỗi lần ghi) rồi đổi tên để
+                # không làm hỏng kho khi bị ngắt hoặc có tiến trình khác cùng ghi
+                fd, tmp = tempfile.mkstemp(dir=self.root, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+                os.close(fd)
+                try:
+                    df_new.to_parquet(tmp, index=False)
+                    os.replace(tmp, path)
+                except BaseException:
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+                    raise
+
+    def refresh(self, tickers=None, period="1y", provider=None, today=None, **kwargs):
+        """Tải phần còn thiếu cho từng mã rồi ghép vào kho.
+
+        Mã chưa có trong kho được tải đủ `period`; mã đã có tải lại từ
+        phiên cuối cùng đã lưu (kể cả khi đó là hôm nay) để nến lưu giữa
+        phiên được thay bằng giá mới nhất.
+        """
+        tickers = list(tickers or VN30_TICKERS)
+        today = pd.Timestamp(today or pd.Timestamp.today()).normalize()
+        t0 = time.perf_counter()
+        if self.read_only:
+            data = self.read(tickers, start=period_start(period, today))
+            return LoadResult(data=data, failed=[], elapsed=time.perf_counter() - t0)
+
+        groups = {}
+        for tk in tickers:
+            last = self.last_date(tk)
+            if last is None:
+                groups.setdefault(None, []).append(tk)
+            else:
+                groups.setdefault(last.normalize(), []).append(tk)
+
+
+        failed = []
+        for since, symbols in groups.items():
+            if since is None:
+                result = fetch_vn30(symbols, period=period, provider=provider, **kwargs)
+                failed.extend(result.failed)
+            else:
+                # Chưa có phiên mới (cuối tuần, ngày lễ) không phải là lỗi
+                result = fetch_vn30(
+                    symbols, period=period, provider=provider, start=since,
+                    **{"retries": 1, **kwargs}
+                )
+                failed.extend(e for e in result.failed if e.error != NO_DATA)
+            self.append(result.data)
+
+        data = self.read(tickers, start=period_start(period, today))
+        return LoadResult(data=data, failed=failed, elapsed=time.perf_counter() - t0)
+
+
+# ===========================================================
+# 6️⃣ Tải nền (prefetch) cho dashboard
+# ===========================================================
+# Giao diện không chờ tải xong mới vẽ: luồng nền đọc ngay bản chụp trong kho
+# Parquet (nếu có) để trang có dữ liệu trong chưa tới một giây, sau đó mới
+# tải phần chênh lệch và thay bằng panel mới. Hết `ttl` thì lần truy cập kế
+# tiếp kích hoạt làm mới ở nền, vẫn trả dữ liệu cũ trong lúc chờ. Lượt tải
+# lỗi (mất mạng, lỗi đọc kho...) được thử lại sau `retry_after` giây.
+
+class BackgroundLoader:
+    def __init__(self, store, tickers=None, period="1y", ttl=3600, retry_after=60, **fetch_kwargs):
+        self.store = store
+        self.tickers = list(tickers or VN30_TICKERS)
+        self.period = period
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self.fetch_kwargs = fetch_kwargs
+        self._lock = threading.Lock()
+        self._snapshot_ready = threading.Event()   # đã đọc xong bản chụp trong kho (có thể rỗng)
+        self._first_done = threading.Event()
+        self._thread = None
+        self._panel = None
+        self._failed = []
+        self._fresh = False
+        self._next_refresh = None       # thời điểm (monotonic) được phép tải lại
+
+    def start(self):
+        """Chạy một lượt tải nền nếu chưa có lượt nào đang chạy."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="vn30-prefetch", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        try:
+            if self._panel is None:
+                snapshot = self.store.read(self.tickers, start=period_start(self.period))
+                if not snapshot.empty:
+                    with self._lock:
+                        self._panel = build_panel(snapshot)
+            # Có bản chụp thì người chờ dùng ngay, không phải đợi cả lượt tải mạng
+            self._snapshot_ready.set()
+            result = self.store.refresh(self.tickers, period=self.period, **self.fetch_kwargs)
+            panel = build_panel(result.data)
+            with self._lock:
+                if not panel.data.empty or self._panel is None:
+                    self._panel = panel
+                self._failed = result.failed
+                self._fresh = True
+                self._next_refresh = time.monotonic() + self.ttl
+        except Exception as e:
+            logger.exception("Tải nền VN30 thất bại")
+            with self._lock:
+                self._failed = [FetchError("VN30", 1, f"{type(e).__name__}: {e}")]
+                self._next_refresh = time.monotonic() + min(self.retry_after, self.ttl)
+        finally:
+            self._snapshot_ready.set()
+            self._first_done.set()
+
+    @property
+    def is_fresh(self):
+        return self._fresh
+
+    @property
+    def is_loading(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def latest(self):
+        """(panel hoặc None, danh sách mã lỗi, đã là dữ liệu mới nhất chưa)."""
+        if self._next_refresh is not None and time.monotonic() >= self._next_refresh:
+            self._fresh = False
+            self.start()
+        elif self._thread is None:
+            self.start()
+        with self._lock:
+            return self._panel, list(self._failed), self._fresh
+
+    def wait(self, timeout=None):
+        """Chờ tới khi có panel: bản chụp trong kho, hoặc lượt tải đầu tiên nếu kho rỗng."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._snapshot_ready.wait(timeout)
+        with self._lock:
+            has_panel = self._panel is not None
+        if not has_panel:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            self._first_done.wait(remaining)
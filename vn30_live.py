@@ -0,0 +1,178 @@
+# ===========================================================
+# File: vn30_live.py
+# Chế độ trực tiếp: thăm dò giá trong phiên và ghép thêm nến mới
+# ===========================================================
+# Nguồn giá (quote source) là hàm source(symbols, timeout=10) -> DataFrame
+# cùng định dạng yf.download (cột MultiIndex (mã, trường)), chứa các nến gần
+# nhất trong phiên. LiveFeed chỉ giữ lại các nến sau nến cuối cùng đã có của
+# từng mã, rồi cập nhật chỉ báo và chỉ tiêu tổng quan theo kiểu tăng dần.
+#
+# Panel ngày có thể đã chứa nến của chính phiên đang giao dịch (lưu giữa
+# phiên, chưa đóng cửa). Ở lần thăm dò đầu tiên, feed lấy ngày của các nến
+# trong phiên làm mốc và bỏ các nến ngày từ mốc đó trở đi khỏi lịch sử: các
+# nến trong phiên thay thế nến ngày chưa hoàn tất, nên một phiên không bị
+# tính hai lần.
+
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from vn30_analytics import IndicatorEngine, IndicatorParams, RunningSummary
+from vn30_data import _split_batch, build_panel
+
+# ===========================================================
+# 1️⃣ Nguồn giá trong phiên
+# ===========================================================
+
+def yfinance_quotes(interval="1m"):
+    """Nến trong ngày của Yahoo Finance (mặc định nến 1 phút)."""
+    def source(symbols, timeout=10):
+        import yfinance as yf
+
+        return yf.download(
+            symbols, period="1d", interval=interval, group_by="ticker",
+            threads=True, progress=False, timeout=timeout
+        )
+    return source
+
+
+def synthetic_quotes(anchor, step="1min", vol=0.001, seed=0, start=None):
+    """Nguồn giá giả lập (không cần mạng): mỗi lần gọi sinh thêm một nến cho
+    mỗi mã, tiếp nối từ giá `anchor` {mã: giá đóng cửa cuối}.
+
+    Đồng hồ giả lập bắt đầu từ `start` (mặc định: thời điểm hiện tại) và tăng
+    `step` sau mỗi lần gọi, nên có thể thử chế độ trực tiếp nhanh hơn thời gian thực.
+    """
+    rng = np.random.default_rng(seed)
+    step = pd.Timedelta(step)
+    prices = dict(anchor)
+    clock = {"t": (pd.Timestamp.now() if start is None else pd.Timestamp(start)).floor(step)}
+
+    def source(symbols, timeout=10):
+        clock["t"] += step
+        blocks = {}
+        for sym in symbols:
+            if sym not in prices:
+                continue
+            open_ = prices[sym]
+            close = open_ * np.exp(rng.normal(0, vol))
+            high = max(open_, close) * (1 + abs(rng.normal(0, vol / 2)))
+            low = min(open_, close) * (1 - abs(rng.normal(0, vol / 2)))
+            volume = int(rng.lognormal(9, 0.8))
+            for field, value in zip(["Open", "High", "Low", "Close", "Volume"],
+                                    [open_, high, low, close, volume]):
+                blocks[(sym, field)] = [value]
+            prices[sym] = close
+        raw = pd.DataFrame(blocks, index=pd.DatetimeIndex([clock["t"]], name="Date"))
+        if blocks:
+            raw.columns = pd.MultiIndex.from_tuples(raw.columns, names=["Ticker", "Price"])
+        return raw
+    return source
+
+
+# ===========================================================
+# 2️⃣ Bảng giá trực tiếp (ghép nến mới + cập nhật tăng dần)
+# ===========================================================
+
+class LiveFeed:
+    """Giá của mọi mã = lịch sử ngày của panel (đến hết phiên trước `session`)
+    + các nến trong phiên đã thăm dò.
+
+    Panel gốc không bị sửa: mỗi mã ban đầu trỏ tới lát cắt của panel, chỉ mã
+    có nến mới mới được ghép thành khung mới. Chỉ báo (IndicatorEngine.append)
+    và chỉ tiêu tổng quan (RunningSummary) chỉ tính thêm cho các nến mới.
+    `session` (ngày của phiên đang thăm dò) mặc định lấy từ lần thăm dò đầu tiên.
+    """
+
+    def __init__(self, panel, source, params=IndicatorParams(), timeout=10, session=None):
+        self.source = source
+        self.timeout = timeout
+        self.params = params
+        self.session = None
+        self.n_updates = 0
+        self.n_bars = 0
+        self.last_error = None
+        self._polled_at = None
+        self._lock = threading.Lock()
+        self._reset(panel)
+        if session is not None:
+            self._anchor(pd.Timestamp(session).normalize())
+
+    def _reset(self, panel):
+        self.panel = panel
+        self.base_version = panel.version
+        self.frames = dict(panel.frames)
+        self.engine = IndicatorEngine(self.params).sync(panel)
+        self.summaries = {tk: RunningSummary(df["Close"].to_numpy()) for tk, df in self.frames.items()}
+
+    def _anchor(self, session):
+        """Neo lịch sử vào nến ngày cuối cùng trước phiên `session`."""
+        self.session = session
+        data = self.panel.data
+        if not data.empty and data["Date"].max() >= session:
+            self._reset(build_panel(data[data["Date"] < session]))
+
+    @property
+    def version(self):
+        return f"{self.base_version}+live{self.n_updates}"
+
+    def poll(self, min_interval=0.0):
+        """Lấy nến mới từ nguồn (nhiều phiên dùng chung feed thì chỉ một phiên
+        gọi nguồn trong mỗi `min_interval` giây). Trả về số nến đã thêm."""
+        with self._lock:
+            now = time.monotonic()
+            if self._polled_at is not None and now - self._polled_at < min_interval:
+                return 0
+            self._polled_at = now
+            symbols = [f"{tk}.VN" for tk in self.frames]
+            try:
+                raw = self.source(symbols, timeout=self.timeout)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                return 0
+            self.last_error = None
+
+            bars = {sym.replace(".VN", ""): _intraday(df) for sym, df in _split_batch(raw, symbols).items()}
+            bars = {tk: df for tk, df in bars.items() if not df.empty}
+            if self.session is None and bars:
+                self._anchor(min(df["Date"].min() for df in bars.values()).normalize())
+
+            new_rows = {}
+            for tk, df in bars.items():
+                if tk not in self.frames:
+                    continue
+                rows = self._new_bars(tk, df)
+                if rows.empty:
+                    continue
+                self.frames[tk] = pd.concat([self.frames[tk], rows], ignore_index=True)
+                for close in rows["Close"].to_numpy():
+                    self.summaries[tk].update(close)
+                new_rows[tk] = rows
+            if new_rows:
+                self.n_updates += 1
+                self.n_bars += sum(len(rows) for rows in new_rows.values())
+                self.engine.append(new_rows, self.version)
+            return sum(len(rows) for rows in new_rows.values())
+
+    def _new_bars(self, tk, df):
+        """Các nến sau nến cuối cùng đã có của mã."""
+        prev = self.frames[tk]
+        rows = df[df["Date"] > prev["Date"].iloc[-1]][prev.columns]
+        return rows.astype(prev.dtypes.to_dict())           # giữ kiểu gọn của panel (float32, category)
+
+    def get(self, ticker):
+        return self.frames.get(ticker)
+
+    def metrics(self, ticker):
+        return self.summaries[ticker].metrics()
+
+
+def _intraday(df):
+    """Nến trong phiên có giá, bỏ múi giờ (giữ giờ địa phương)."""
+    df = df.dropna(subset=["Close"])
+    dates = pd.to_datetime(df["Date"])
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
+    return df.assign(Date=dates)
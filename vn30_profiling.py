@@ -0,0 +1,140 @@
+# ===========================================================
+# File: vn30_profiling.py
+# Đo thời gian từng bước, cache hit/miss và kích thước biểu đồ
+# ===========================================================
+# Mỗi lần Streamlit chạy lại script là một "run". Profiler của run hiện tại
+# được giữ theo luồng (mỗi phiên Streamlit chạy trên một luồng riêng), nên
+# các hàm cache có thể ghi hit/miss mà không cần truyền tham số.
+# Khi tắt, mọi hàm ghi nhận đều không làm gì (không tốn chi phí đo).
+
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+METRICS_FILE = os.environ.get("VN30_METRICS_FILE", "data_cache/metrics.jsonl")
+
+_local = threading.local()
+
+
+class Profiler:
+    def __init__(self, enabled=False, **context):
+        self.enabled = enabled
+        self.context = context          # tab, ticker, session... ghi kèm vào log
+        self.events = []
+        self._open = []                 # số dòng của các khối phase đang mở
+        self._t0 = time.perf_counter()
+
+    def _add(self, kind, name, wall_s, **fields):
+        self.events.append({"kind": kind, "name": name, "wall_s": wall_s, **fields})
+
+    @contextmanager
+    def phase(self, name, rows=None):
+        """Đo thời gian một khối lệnh (ví dụ cả một tab). Số dòng dữ liệu khối
+        xử lý truyền qua `rows`, hoặc ghi từ bên trong khối bằng set_rows()."""
+        if not self.enabled:
+            yield
+            return
+        t0 = time.perf_counter()
+        self._open.append(rows)
+        try:
+            yield
+        finally:
+            self._add("phase", name, time.perf_counter() - t0, rows=self._open.pop())
+
+    def set_rows(self, rows):
+        """Ghi số dòng dữ liệu mà khối phase trong cùng đang mở thực sự xử lý."""
+        if self.enabled and self._open:
+            self._open[-1] = rows
+
+    def record_cache(self, name, hit, wall_s):
+        if self.enabled:
+            self._add("cache", name, wall_s, hit=hit)
+
+    def record_figure(self, name, fig):
+        """Kích thước JSON của biểu đồ (đúng phần sẽ gửi tới trình duyệt)."""
+        if not self.enabled:
+            return
+        t0 = time.perf_counter()
+        payload = fig.to_json()
+        n_points = sum(len(trace.x) for trace in fig.data if getattr(trace, "x", None) is not None)
+        self._add("figure", name, time.perf_counter() - t0,
+                  bytes=len(payload.encode("utf-8")), points=n_points)
+
+    def summary(self):
+        """Tổng hợp theo loại: thời gian, số lần cache hit/miss, tổng byte biểu đồ."""
+        caches = [e for e in self.events if e["kind"] == "cache"]
+        figures = [e for e in self.events if e["kind"] == "figure"]
+        return {
+            "total_s": time.perf_counter() - self._t0,
+            "cache_hits": sum(e["hit"] for e in caches),
+            "cache_misses": sum(not e["hit"] for e in caches),
+            "cache_miss_s": sum(e["wall_s"] for e in caches if not e["hit"]),
+            "figures": len(figures),
+            "figure_bytes": sum(e["bytes"] for e in figures),
+            "figure_serialize_s": sum(e["wall_s"] for e in figures),
+        }
+
+    def flush(self, path=METRICS_FILE):
+        """Ghi một dòng JSON cho run này vào file metrics (dạng JSON Lines)."""
+        if not self.enabled:
+            return
+        record = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "run_id": uuid.uuid4().hex[:12],
+            **self.context,
+            **self.summary(),
+            "events": self.events,
+        }
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+
+def start_run(enabled=False, **context):
+    """Tạo profiler cho lần chạy script hiện tại (trên luồng hiện tại)."""
+    _local.profiler = Profiler(enabled, **context)
+    return _local.profiler
+
+
+def current():
+    profiler = getattr(_local, "profiler", None)
+    return profiler if profiler is not None else Profiler(enabled=False)
+
+
+def profiled_cache(cache_decorator, name=None):
+    """Bọc một decorator cache (st.cache_data / st.cache_resource) để ghi hit/miss.
+
+    Thân hàm chỉ chạy khi cache miss, nên cờ đặt trong thân hàm cho biết
+    lần gọi đó là hit hay miss.
+    """
+    def wrap(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def body(*args, **kwargs):
+            _local.cache_miss = True
+            return fn(*args, **kwargs)
+
+        cached = cache_decorator(body)
+
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            # Giữ cờ của hàm cache bên ngoài khi gọi lồng nhau
+            outer_flag = getattr(_local, "cache_miss", False)
+            _local.cache_miss = False
+            t0 = time.perf_counter()
+            try:
+                result = cached(*args, **kwargs)
+                hit = not _local.cache_miss
+            finally:
+                _local.cache_miss = outer_flag
+            current().record_cache(label, hit=hit, wall_s=time.perf_counter() - t0)
+            return result
+
+        call.clear = getattr(cached, "clear", None)
+        return call
+    return wrap
@@ -0,0 +1,129 @@
+# ===========================================================
+# File: vn30_report.py
+# Tạo báo cáo hàng loạt cho toàn bộ VN30 (không cần Streamlit)
+#
+# Ví dụ:
+#   python vn30_report.py --out reports --workers 8
+#   python vn30_report.py --offline --tickers FPT VNM --format png
+# ===========================================================
+
+import argparse
+import importlib.util
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from vn30_analytics import (
+    daily_returns, monte_carlo_inputs, period_statistics, resample_ohlcv, return_statistics,
+    screen_universe, simulate_percentiles, summary_metrics
+)
+from vn30_charts import (
+    montecarlo_fan_figure, price_area_figure, returns_histogram_figure
+)
+from vn30_data import VN30_TICKERS, PriceStore, build_panel, period_start
+
+
+# ===========================================================
+# 1️⃣ Báo cáo một mã (chạy trong tiến trình con)
+# ===========================================================
+
+def _save_figure(fig, path, fmt):
+    if fmt == "png":
+        fig.write_image(path + ".png", width=1200, height=600)   # cần gói kaleido
+    else:
+        fig.write_html(path + ".html", include_plotlyjs="cdn")
+
+
+def report_ticker(ticker, df, out_dir, fmt="html", n_sim=10000, horizon=60):
+    """Ghi số liệu + biểu đồ của một mã vào out_dir/<ticker>/, trả về (mã, thời gian chạy)."""
+    t0 = time.perf_counter()
+    folder = os.path.join(out_dir, ticker)
+    os.makedirs(folder, exist_ok=True)
+
+    metrics = summary_metrics(df)
+    df_ret = daily_returns(df)
+    stats_df = return_statistics(df_ret["Lợi_nhuận"])
+    last_price, daily_vol, _ = monte_carlo_inputs(df)
+    bands, final_prices = simulate_percentiles(last_price, daily_vol, n_sim, horizon, seed=42)
+    metrics["mc_horizon"] = horizon
+    metrics["mc_quantiles"] = bands.iloc[-1].to_dict()
+    metrics["mc_prob_up"] = float((final_prices > last_price).mean())
+
+    with open(os.path.join(folder, "metrics.json"), "w", encoding="utf-8") as f:
+        json.dump(metrics, f, ensure_ascii=False, indent=2)
+    stats_df.to_csv(os.path.join(folder, "statistics.csv"), encoding="utf-8")
+    for freq, name in [("M", "monthly"), ("Q", "quarterly")]:
+        period_statistics(resample_ohlcv(df, freq)).to_csv(os.path.join(folder, f"{name}.csv"), index=False)
+
+    _save_figure(price_area_figure(df, ticker), os.path.join(folder, "price"), fmt)
+    _save_figure(returns_histogram_figure(df_ret, ticker), os.path.join(folder, "returns_hist"), fmt)
+    _save_figure(montecarlo_fan_figure(bands, ticker, n_sim), os.path.join(folder, "montecarlo"), fmt)
+    return ticker, time.perf_counter() - t0
+
+
+# ===========================================================
+# 2️⃣ Chạy song song toàn bộ VN30
+# ===========================================================
+
+def run(tickers, out_dir, workers=None, fmt="html", offline=False, period="1y",
+        n_sim=10000, horizon=60):
+    # Kiểm tra trước khi tải dữ liệu, thay vì để từng tiến trình con báo lỗi
+    if fmt == "png" and importlib.util.find_spec("kaleido") is None:
+        print("❌ Xuất PNG cần gói kaleido: pip install kaleido (hoặc dùng --format html).")
+        return 1
+
+    store = PriceStore()
+    if offline:
+        data = store.read(tickers, start=period_start(period))
+        failed = []
+    else:
+        result = store.refresh(tickers, period=period)
+        data, failed = result.data, result.failed
+    for err in failed:
+        print(f"⚠️ Không tải được {err.ticker}: {err.error}")
+
+    panel = build_panel(data)
+    if not panel.tickers:
+        print("❌ Không có dữ liệu để tạo báo cáo.")
+        return 1
+
+    os.makedirs(out_dir, exist_ok=True)
+    screen_universe(panel.data).to_csv(os.path.join(out_dir, "screener.csv"), encoding="utf-8")
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(report_ticker, tk, df, out_dir, fmt, n_sim, horizon)
+            for tk, df in panel.frames.items()
+        ]
+        for fut in futures:
+            tk, elapsed = fut.result()
+            print(f"✅ {tk}: {elapsed:.2f}s")
+    print(f"Hoàn tất {len(futures)} mã trong {time.perf_counter() - t0:.2f}s → {out_dir}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tạo báo cáo hàng loạt cho các mã VN30")
+    parser.add_argument("--tickers", nargs="*", default=None,
+                        help="Danh sách mã (mặc định: toàn bộ VN30), ví dụ FPT VNM")
+    parser.add_argument("--out", default="reports", help="Thư mục ghi báo cáo")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Số tiến trình song song (mặc định: số nhân CPU)")
+    parser.add_argument("--format", choices=["html", "png"], default="html",
+                        help="Định dạng biểu đồ (png cần cài kaleido)")
+    parser.add_argument("--offline", action="store_true",
+                        help="Chỉ đọc kho Parquet cục bộ, không tải dữ liệu mới")
+    parser.add_argument("--period", default="1y", help="Khoảng dữ liệu (kiểu yfinance)")
+    parser.add_argument("--n-sim", type=int, default=10000, help="Số lần mô phỏng Monte Carlo")
+    parser.add_argument("--horizon", type=int, default=60, help="Số ngày dự báo Monte Carlo")
+    args = parser.parse_args(argv)
+
+    tickers = [tk if tk.endswith(".VN") else f"{tk}.VN" for tk in (args.tickers or VN30_TICKERS)]
+    return run(tickers, args.out, args.workers, args.format, args.offline, args.period,
+               args.n_sim, args.horizon)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())